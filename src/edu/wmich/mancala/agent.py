@@ -5,21 +5,31 @@ Created on Apr 23, 2010
 @author: changwang
 '''
 
-from player import RandomPlayer, SimplePlayer, NNPlayer, HumanPlayer
+from player import RandomPlayer, SimplePlayer, NNPlayer, HumanPlayer, AlphaBetaPlayer
+from mcts import MCTSPlayer
+from book import BookPlayer
 
 class PlayerAgent(object):
-    def __init__(self, type, id):
+    def __init__(self, type, id, book=None):
         self.player = None
         if type.startswith("random"):
             self.player = RandomPlayer(id)
         elif type.startswith("simple"):
             self.player = SimplePlayer(id)
-        elif type.startswith("nn"):
+        elif type.startswith("nn") or type.startswith("neural"):
             self.player = NNPlayer(id, 6, 4)
         elif type.startswith("human"):
             self.player = HumanPlayer(id)
+        elif type.startswith("alphabeta"):
+            self.player = AlphaBetaPlayer(id)
+        elif type.startswith("mcts"):
+            self.player = MCTSPlayer(id)
         else:
             self.player = RandomPlayer(id)
+        
+        # consult the opening book before the player's own choice
+        if book is not None:
+            self.player = BookPlayer(self.player, book)
             
     def createPlayer(self):
         return self.player
\ No newline at end of file
@@ -0,0 +1,297 @@
+#coding:utf-8
+'''
+Created on May 3, 2010
+
+@author: changwang
+'''
+
+class ArrayMancalaBoard(object):
+    """ a mancala board that keeps all pit counts in one flat list instead
+    of a graph of Pit objects. the layout is
+
+        [bottom pits 0..rowSize-1, bottom mancala,
+         top pits 0..rowSize-1, top mancala]
+
+    so player p owns indices p*(rowSize+1) .. p*(rowSize+1)+rowSize-1 and
+    its mancala sits right after them. sowing uses tables precomputed per
+    player, so playPit never has to test for the opponent's mancala. """
+
+    # (across, paths, sown) for each row size, shared by every board
+    _tables = {}
+
+    def __init__(self, rowSize=6, stonePerPit=4):
+        self.rowSize = rowSize
+        self.stonePerPit = stonePerPit
+        self.size = 2 * rowSize + 2
+
+        self.pits = None
+        self.mancala = [rowSize, 2 * rowSize + 1]   # index of each player's mancala
+        self.across = None  # index of the pit across from each pit
+        self.paths = None   # paths[player][pitnum], pits a sowing visits
+        self.sown = None    # sown[player][pitnum][r], what path[:r] adds to each side
+
+        self.totals = None  # stones on each player's side, kept up to date
+
+        self.setupTables()
+        self.setupBoard()
+
+    def setupTables(self):
+        """ precompute the opposite pit and sowing path tables, once per row
+        size. the tables are never written to, so boards share them """
+        tables = ArrayMancalaBoard._tables.get(self.rowSize)
+        if tables is None:
+            self._buildTables()
+            tables = (self.across, self.paths, self.sown)
+            ArrayMancalaBoard._tables[self.rowSize] = tables
+        self.across, self.paths, self.sown = tables
+
+    def _buildTables(self):
+        n = self.rowSize
+        self.across = [2 * n - i for i in range(self.size)]
+        self.across[self.mancala[0]] = self.mancala[1]
+        self.across[self.mancala[1]] = self.mancala[0]
+
+        self.paths = {}
+        for player in range(2):
+            oppMancala = self.mancala[(player+1)%2]
+            offset = player * (n + 1)
+            self.paths[player] = []
+            for pitnum in range(n):
+                path = []
+                i = offset + pitnum
+                while len(path) < self.size - 1:
+                    i = (i + 1) % self.size
+                    if i != oppMancala:
+                        path.append(i)
+                self.paths[player].append(path)
+
+        # stones each side's pits get from the first r steps of a path,
+        # as (own stones, opp stones)
+        self.sown = {}
+        for player in range(2):
+            self.sown[player] = []
+            for path in self.paths[player]:
+                counts = [0, 0]
+                prefix = [(0, 0)]
+                for i in path:
+                    side, pitnum = divmod(i, n + 1)
+                    if pitnum < n:
+                        counts[0 if side == player else 1] += 1
+                    prefix.append((counts[0], counts[1]))
+                self.sown[player].append(prefix)
+
+    def setupBoard(self):
+        """ initialize the board """
+        n = self.rowSize
+        self.pits = ([self.stonePerPit] * n + [0]) * 2
+        self._countSides()
+
+    def _countSides(self):
+        """ recomputes the side totals from the pits """
+        self.totals = [sum(self.mySide(0)), sum(self.mySide(1))]
+
+    def _pitIndex(self, player, pitnum):
+        return player * (self.rowSize + 1) + pitnum
+
+    def getPits(self):
+        """ returns a copy of every count in board order """
+        return self.pits[:]
+
+    def setPits(self, pits):
+        """ sets every count from a list in board order, the list is copied """
+        self.pits = list(pits)
+        self._countSides()
+
+    def legalMoves(self, player):
+        """ returns the bitmask of player's non-empty pits, bit i for pit i.
+        it is built from the pits on each call, which is cheaper than
+        keeping it up to date in every move """
+        start = player * (self.rowSize + 1)
+        mask = 0
+        bit = 1
+        for stones in self.pits[start:start+self.rowSize]:
+            if stones:
+                mask |= bit
+            bit <<= 1
+        return mask
+
+    def mySide(self, player):
+        """ returns a list of pits count on player's side """
+        start = player * (self.rowSize + 1)
+        return self.pits[start:start+self.rowSize]
+
+    def oppSide(self, player):
+        """ returns a list of pits count on opponent's side """
+        return self.mySide((player+1)%2)
+
+    def stonesInMyMancala(self, player):
+        """ return the number of stones in player's mancala """
+        return self.pits[self.mancala[player]]
+
+    def stonesInOppMancala(self, player):
+        """ return the number of stones in opponent's mancala """
+        return self.pits[self.mancala[(player+1)%2]]
+
+    def playPit(self, player, pitnum):
+        """ plays the pits, return true if the player gets another turn """
+        return self._sow(player, pitnum)[0]
+
+    def makeMove(self, player, pitnum):
+        """ plays the pits like playPit, returns (getsTurn, undo) where
+        undo can be passed to unmakeMove to take the move back """
+        total0, total1 = self.totals
+        getsTurn, stones, last, captured = self._sow(player, pitnum)
+        return getsTurn, (player, pitnum, stones, last, captured, total0, total1)
+
+    def _sow(self, player, pitnum):
+        """ plays the pits for playPit and makeMove, returns (getsTurn,
+        stones, last, captured): the stones picked up, the index of the
+        last pit sown and the stones captured from the opponent """
+        pits = self.pits
+        offset = player * (self.rowSize + 1)
+        stones = pits[offset + pitnum]
+        if stones == 0:
+            return True, 0, 0, 0
+        pits[offset + pitnum] = 0
+
+        path = self.paths[player][pitnum]
+        laps, rest = divmod(stones, len(path))
+        if laps:
+            for i in path:
+                pits[i] += laps
+        for i in path[:rest]:
+            pits[i] += 1
+
+        # update the side totals from the precomputed table
+        totals = self.totals
+        own, other = self.sown[player][pitnum][rest]
+        laps *= self.rowSize
+        totals[player] += laps + own - stones
+        totals[1 - player] += laps + other
+
+        last = path[(stones - 1) % len(path)]
+        mancala = offset + self.rowSize
+        if last == mancala:
+            return True, stones, last, 0
+        if pits[last] == 1 and offset <= last < mancala:
+            across = 2 * self.rowSize - last
+            captured = pits[across]
+            if captured:
+                pits[mancala] += 1 + captured
+                pits[last] = 0
+                pits[across] = 0
+                totals[player] -= 1
+                totals[1 - player] -= captured
+                return False, stones, last, captured
+        return False, stones, last, 0
+
+    def unmakeMove(self, undo):
+        """ takes back the move that returned undo from makeMove, moves
+        must be taken back in reverse order """
+        player, pitnum, stones, last, captured, total0, total1 = undo
+        if stones == 0:
+            return
+        self.totals = [total0, total1]
+        pits = self.pits
+        if captured:
+            pits[self.mancala[player]] -= 1 + captured
+            pits[last] = 1
+            pits[self.across[last]] = captured
+
+        path = self.paths[player][pitnum]
+        laps, rest = divmod(stones, len(path))
+        if laps:
+            for i in path:
+                pits[i] -= laps
+        for i in path[:rest]:
+            pits[i] -= 1
+        pits[player * (self.rowSize + 1) + pitnum] = stones
+
+    def inPlay(self, player):
+        """ returns the number of stones on the player's side
+        (excluding those in the mancala) """
+        return self.totals[player]
+
+    def isGameOver(self):
+        """ checks if at least one side is clear """
+        plays = self.totals
+        if plays[0] == 0 or plays[1] == 0:
+            self.pits = [0] * self.rowSize + [self.pits[self.mancala[0]] + plays[0]] + \
+                        [0] * self.rowSize + [self.pits[self.mancala[1]] + plays[1]]
+            self.totals = [0, 0]
+            return True
+        return False
+
+    def isTerminal(self):
+        """ checks if at least one side is clear, without touching the board """
+        return self.totals[0] == 0 or self.totals[1] == 0
+
+    def finalScore(self):
+        """ returns the score of both players if the game ended now, with
+        the stones left on each side counted for that side's mancala,
+        without touching the board """
+        return (self.stonesInMyMancala(0) + self.inPlay(0),
+                self.stonesInMyMancala(1) + self.inPlay(1))
+
+    def winner(self):
+        """ returns the player id with the most stones in the mancala """
+        if self.stonesInMyMancala(0) > self.stonesInMyMancala(1):
+            return 0
+        elif self.stonesInMyMancala(0) < self.stonesInMyMancala(1):
+            return 1
+        else:
+            return -1
+
+    def printBoard(self):
+        """ print the current board """
+        top = [str(s) for s in self.mySide(1)]
+        bottom = [str(s) for s in self.mySide(0)]
+        top.reverse()
+        print "    index   ||      ||(6)||(5)||(4)||(3)||(2)||(1)||      ||"
+        print "            ||============================================||"
+        print "            ||      || " + " || ".join(top) + " || " + "     ||"
+        print "Opponent →  ||   " + str(self.stonesInMyMancala(1)) + "  ||============================||   " + str(self.stonesInMyMancala(0))  + "  || ← You"
+        print "            ||      || " + " || ".join(bottom) + " || " + "     ||"
+        print "            ||============================================||"
+        print "    index   ||      ||(1)||(2)||(3)||(4)||(5)||(6)||      ||"
+
+
+def _playRandomGame(board, moves):
+    """ plays the given list of random numbers as moves on board, returns
+    the number of plies played """
+    plies = 0
+    player = 0
+    while not board.isGameOver():
+        side = board.mySide(player)
+        legal = [i for i, s in enumerate(side) if s > 0]
+        pitnum = legal[moves[plies % len(moves)] % len(legal)]
+        if not board.playPit(player, pitnum):
+            player = (player+1)%2
+        plies += 1
+    return plies
+
+if __name__ == '__main__':
+    import random
+    import time
+    from mancala import MancalaBoard
+
+    random.seed(2010)
+    games = 2000
+    moves = [[random.randint(0, 719) for i in range(200)] for g in range(games)]
+
+    # both backends must agree on every game before timing means anything
+    for g in range(games):
+        pitBoard = MancalaBoard()
+        arrayBoard = ArrayMancalaBoard()
+        _playRandomGame(pitBoard, moves[g])
+        _playRandomGame(arrayBoard, moves[g])
+        for player in range(2):
+            assert pitBoard.stonesInMyMancala(player) == arrayBoard.stonesInMyMancala(player)
+
+    for name, boardClass in [("Pit", MancalaBoard), ("Array", ArrayMancalaBoard)]:
+        plies = 0
+        start = time.time()
+        for g in range(games):
+            plies += _playRandomGame(boardClass(), moves[g])
+        elapsed = time.time() - start
+        print "%-6s %d games, %d plies in %.3fs (%.0f plies/s)" % (name, games, plies, elapsed, plies / elapsed)
@@ -0,0 +1,190 @@
+#coding:utf-8
+'''
+Created on May 5, 2010
+
+@author: changwang
+'''
+
+import numpy
+
+from arrayboard import ArrayMancalaBoard
+
+class BatchMancalaBoard(object):
+    """ holds numGames boards as one (numGames, 2*rowSize+2) array, using
+    the same layout as ArrayMancalaBoard, and advances every unfinished
+    game by one ply per call to step. """
+
+    def __init__(self, numGames, rowSize=6, stonePerPit=4):
+        self.numGames = numGames
+        self.rowSize = rowSize
+        self.stonePerPit = stonePerPit
+
+        # reuse the scalar board's tables so both follow the same rules
+        tables = ArrayMancalaBoard(rowSize, stonePerPit)
+        self.size = tables.size
+        self.mancala = numpy.array(tables.mancala)
+        self.across = numpy.array(tables.across)
+        self.paths = numpy.array([tables.paths[0], tables.paths[1]])  # (2, rowSize, size-1)
+        self.offset = numpy.array([0, rowSize + 1])
+
+        self.rows = numpy.arange(numGames)
+        self.pathSteps = numpy.arange(self.size - 1)
+
+        self.pits = None
+        self.toMove = None  # player to move in each game
+        self.done = None    # true once a game has been swept
+        self.plies = None   # number of plies played in each game
+
+        self.setupBoard()
+
+    def setupBoard(self):
+        """ initialize every board to the starting position """
+        n = self.rowSize
+        start = ([self.stonePerPit] * n + [0]) * 2
+        self.pits = numpy.tile(numpy.array(start, dtype=numpy.int32), (self.numGames, 1))
+        self.toMove = numpy.zeros(self.numGames, dtype=numpy.int32)
+        self.done = numpy.zeros(self.numGames, dtype=bool)
+        self.plies = numpy.zeros(self.numGames, dtype=numpy.int32)
+
+    def sides(self, player):
+        """ returns the (numGames, rowSize) pit counts on player's side """
+        start = player * (self.rowSize + 1)
+        return self.pits[:, start:start+self.rowSize]
+
+    def moverSides(self):
+        """ returns the pit counts on the side of the player to move """
+        cols = self.offset[self.toMove][:, None] + numpy.arange(self.rowSize)
+        return self.pits[self.rows[:, None], cols]
+
+    def legalMoves(self):
+        """ returns a (numGames, rowSize) mask of playable pits """
+        return (self.moverSides() > 0) & ~self.done[:, None]
+
+    def step(self, pitnums):
+        """ plays pitnums[g] for the player to move in every unfinished game.
+        returns a mask of games where that player gets another turn """
+        pitnums = numpy.asarray(pitnums)
+        active = ~self.done
+        rows = self.rows[active]
+        player = self.toMove[active]
+        pitnum = pitnums[active]
+
+        pits = self.pits
+        start = self.offset[player] + pitnum
+        stones = pits[rows, start]
+        moved = stones > 0
+        rows, player, start, stones = rows[moved], player[moved], start[moved], stones[moved]
+        pits[rows, start] = 0
+
+        # sow: every pit on the path gets a stone per lap, the first
+        # rest pits get one more
+        path = self.paths[player, pitnum[moved]]
+        laps, rest = numpy.divmod(stones, self.size - 1)
+        pits[rows[:, None], path] += laps[:, None] + (self.pathSteps < rest[:, None])
+        last = path[numpy.arange(len(rows)), (stones - 1) % (self.size - 1)]
+
+        # capture when the last stone lands in an empty pit on the mover's side
+        mancala = self.mancala[player]
+        across = self.across[last]
+        capture = (pits[rows, last] == 1) & (last >= self.offset[player]) & \
+                  (last < mancala) & (pits[rows, across] > 0)
+        rc, lc, ac = rows[capture], last[capture], across[capture]
+        pits[rc, mancala[capture]] += pits[rc, lc] + pits[rc, ac]
+        pits[rc, lc] = 0
+        pits[rc, ac] = 0
+
+        # playing an empty pit keeps the turn, like MancalaBoard.playPit
+        again = numpy.zeros(self.numGames, dtype=bool)
+        again[self.rows[active][~moved]] = True
+        again[rows] = last == mancala
+        self.plies[self.rows[active]] += 1
+        flip = active & ~again
+        self.toMove[flip] = 1 - self.toMove[flip]
+
+        self._sweep()
+        return again
+
+    def _sweep(self):
+        """ moves the remaining stones into each player's own mancala in
+        games where one side is clear, and marks them done """
+        inPlay = [self.sides(0).sum(axis=1), self.sides(1).sum(axis=1)]
+        over = ~self.done & ((inPlay[0] == 0) | (inPlay[1] == 0))
+        if not over.any():
+            return
+        for player in range(2):
+            self.pits[over, self.mancala[player]] += inPlay[player][over]
+            self.sides(player)[over] = 0
+        self.done |= over
+
+    def isGameOver(self):
+        """ checks if every game has finished """
+        return bool(self.done.all())
+
+    def scores(self):
+        """ returns the (numGames, 2) stones in each player's mancala """
+        return self.pits[:, self.mancala]
+
+    def winners(self):
+        """ returns the winner of every game, -1 for a tie """
+        s = self.scores()
+        return numpy.where(s[:, 0] > s[:, 1], 0, numpy.where(s[:, 0] < s[:, 1], 1, -1))
+
+class BatchRandomPlayer(object):
+    """ chooses a uniformly random non-empty pit in every game """
+    def __init__(self, seed=None):
+        self.random = numpy.random.RandomState(seed)
+
+    def getMoves(self, board):
+        """ returns a pit index (0 to rowSize-1) for every game """
+        legal = board.legalMoves()
+        keys = self.random.random_sample(legal.shape) + legal
+        return keys.argmax(axis=1)
+
+class BatchSimplePlayer(object):
+    """ always plays the non-empty pit closest to its own mancala """
+    def getMoves(self, board):
+        """ returns a pit index (0 to rowSize-1) for every game """
+        legal = board.legalMoves()
+        return board.rowSize - 1 - legal[:, ::-1].argmax(axis=1)
+
+def playGames(board, player0, player1):
+    """ plays every game on board to the end, returns the winners """
+    players = [player0, player1]
+    while not board.isGameOver():
+        moves = numpy.zeros(board.numGames, dtype=numpy.int32)
+        for id in range(2):
+            mine = board.toMove == id
+            if mine.any():
+                moves[mine] = players[id].getMoves(board)[mine]
+        board.step(moves)
+    return board.winners()
+
+if __name__ == '__main__':
+    import time
+
+    # every batched game must replay identically on the scalar board
+    games = 500
+    board = BatchMancalaBoard(games)
+    players = [BatchRandomPlayer(2010), BatchSimplePlayer()]
+    history = []
+    while not board.isGameOver():
+        moves = numpy.where(board.toMove == 0,
+                            players[0].getMoves(board), players[1].getMoves(board))
+        history.append((board.done.copy(), board.toMove.copy(), moves))
+        board.step(moves)
+    for g in range(games):
+        scalar = ArrayMancalaBoard()
+        for done, toMove, moves in history:
+            if done[g]:
+                break
+            scalar.playPit(toMove[g], moves[g])
+            scalar.isGameOver()
+        assert list(scalar.pits) == list(board.pits[g]), g
+
+    for games in [1000, 10000, 100000]:
+        board = BatchMancalaBoard(games)
+        start = time.time()
+        playGames(board, BatchRandomPlayer(2010), BatchRandomPlayer(2011))
+        elapsed = time.time() - start
+        print "%6d games, %d plies in %.3fs (%.0f plies/s)" % \
+            (games, board.plies.sum(), elapsed, board.plies.sum() / elapsed)
@@ -0,0 +1,172 @@
+#coding:utf-8
+'''
+Created on May 28, 2010
+
+@author: changwang
+'''
+
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy
+
+from mancala import MancalaBoard
+from arrayboard import ArrayMancalaBoard
+from batchboard import BatchMancalaBoard, BatchRandomPlayer, playGames
+from neuralnet import NeuralNet
+from player import NNPlayer
+import runner
+
+SEED = 2010
+BACKENDS = [("pit", MancalaBoard), ("array", ArrayMancalaBoard)]
+NETWORK_SIZES = [(15, 30), (15, 60), (31, 62)]
+
+def _randomGame(board):
+    """ plays a random game on board, returns the (player, pitnum) moves """
+    moves = []
+    player = 0
+    while not board.isGameOver():
+        pitnum = random.choice([i for i, s in enumerate(board.mySide(player)) if s > 0])
+        moves.append((player, pitnum))
+        if not board.playPit(player, pitnum):
+            player = (player+1)%2
+    return moves
+
+def _percentiles(samples, points=(50, 90, 99)):
+    """ returns the given percentiles of samples in milliseconds """
+    samples = numpy.array(samples) * 1000.0
+    return dict(("p%d" % p, float(numpy.percentile(samples, p))) for p in points)
+
+def benchEngine(games):
+    """ playPit moves per second, replaying recorded games so only sowing
+    is timed, and whole random games per second, for every backend """
+    random.seed(SEED)
+    recorded = [_randomGame(ArrayMancalaBoard()) for g in range(games)]
+    plies = sum(len(moves) for moves in recorded)
+
+    results = {}
+    for name, boardClass in BACKENDS:
+        boards = [boardClass() for g in range(games)]
+        start = time.time()
+        for board, moves in zip(boards, recorded):
+            for player, pitnum in moves:
+                board.playPit(player, pitnum)
+        elapsed = time.time() - start
+
+        random.seed(SEED)
+        gameStart = time.time()
+        for g in range(games):
+            _randomGame(boardClass())
+        gameElapsed = time.time() - gameStart
+
+        results[name] = {
+            'playPitPerSecond': plies / elapsed,
+            'randomGamesPerSecond': games / gameElapsed,
+        }
+
+    board = BatchMancalaBoard(games)
+    start = time.time()
+    playGames(board, BatchRandomPlayer(SEED), BatchRandomPlayer(SEED + 1))
+    elapsed = time.time() - start
+    results['batch'] = {
+        'playPitPerSecond': board.plies.sum() / elapsed,
+        'randomGamesPerSecond': games / elapsed,
+    }
+    return results
+
+def benchNetwork(calls):
+    """ calculate and learnFromExample calls per second for several input
+    and hidden layer sizes """
+    results = {}
+    for inputSize, hiddenSize in NETWORK_SIZES:
+        numpy.random.seed(SEED)
+        net = NeuralNet(inputSize, hiddenSize)
+        net.hiddenWeights[:] = numpy.random.uniform(-0.5, 0.5, net.hiddenWeights.shape)
+        net.weights[:] = numpy.random.uniform(-0.5, 0.5, net.weights.shape)
+        examples = numpy.random.randint(0, 8, (calls, inputSize)).astype(float).tolist()
+        targets = numpy.random.uniform(-10, 10, calls).tolist()
+
+        start = time.time()
+        for example in examples:
+            net.calculate(example)
+        calculate = calls / (time.time() - start)
+
+        start = time.time()
+        for example, target in zip(examples, targets):
+            net.learnFromExample(example, target)
+        learn = calls / (time.time() - start)
+
+        start = time.time()
+        net.calculateBatch(examples)
+        batch = calls / (time.time() - start)
+
+        results["%dx%d" % (inputSize, hiddenSize)] = {
+            'calculatePerSecond': calculate,
+            'learnFromExamplePerSecond': learn,
+            'calculateBatchRowsPerSecond': batch,
+        }
+    return results
+
+def benchPlayer(positions, games):
+    """ NNPlayer.getMove latency percentiles over positions from random
+    games, with and without the position cache, and self-play training
+    games per second """
+    random.seed(SEED)
+    numpy.random.seed(SEED)
+    boards = []
+    while len(boards) < positions:
+        board = ArrayMancalaBoard()
+        for player, pitnum in _randomGame(ArrayMancalaBoard())[:random.randint(0, 30)]:
+            board.playPit(player, pitnum)
+        if not board.isTerminal():
+            boards.append(board)
+
+    results = {}
+    for name, cacheSize in [("uncached", 0), ("cached", 4096)]:
+        player = NNPlayer(0)
+        player.setLearning(False)
+        player.setCacheSize(cacheSize)
+        player.Q.hiddenWeights[:] = numpy.random.uniform(-0.5, 0.5, player.Q.hiddenWeights.shape)
+        latencies = []
+        for board in boards:
+            start = time.time()
+            player.getMove(board)
+            latencies.append(time.time() - start)
+            player.movelist = [[], []]
+        results["getMoveLatencyMs" + name.capitalize()] = _percentiles(latencies)
+
+    player0 = NNPlayer(0)
+    player1 = NNPlayer(1)
+    player1.Q = player0.Q   # both sides train the same network
+    start = time.time()
+    for g in range(games):
+        runner.playGame(player0, player1)
+    results['selfPlayGamesPerSecond'] = games / (time.time() - start)
+    return results
+
+def runAll(scale=1.0):
+    """ runs every benchmark, scale shrinks or grows the amount of work """
+    return {
+        'seed': SEED,
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'engine': benchEngine(int(2000 * scale)),
+        'network': benchNetwork(int(5000 * scale)),
+        'player': benchPlayer(int(1000 * scale), int(50 * scale)),
+    }
+
+if __name__ == '__main__':
+    filename = sys.argv[1] if len(sys.argv) > 1 else None
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    results = runAll(scale)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if not filename:
+        print text
+    else:
+        f = open(filename, 'w')
+        f.write(text + '\n')
+        f.close()
@@ -0,0 +1,131 @@
+#coding:utf-8
+'''
+Created on May 21, 2010
+
+@author: changwang
+'''
+
+import struct
+import sys
+import time
+
+from arrayboard import ArrayMancalaBoard
+from player import Player, AlphaBetaPlayer, movesFromMask
+
+MAGIC = 'MNCLBOOK'
+VERSION = 1
+HEADER = struct.Struct('<8sIII')    # magic, version, row size, number of entries
+
+def _positionKey(pits, player):
+    """ packs the 2*rowSize+2 counts, mancalas included, and the player to
+    move into a string, one byte each """
+    return str(bytearray(pits + [player]))
+
+def buildBook(filename, depth=4, searchDepth=8, rowSize=6, stonePerPit=4, report=False):
+    """ searches every position reachable from the start in at most depth
+    plies (an extra turn is a ply of its own) to searchDepth plies with
+    AlphaBetaPlayer, and writes the best move of each to filename """
+    board = ArrayMancalaBoard(rowSize, stonePerPit)
+    frontier = [(board.getPits(), 0)]
+    positions = {}
+    for ply in range(depth + 1):
+        following = []
+        for pits, player in frontier:
+            key = _positionKey(pits, player)
+            if key in positions:
+                continue
+            positions[key] = (pits, player)
+            board.setPits(pits)
+            if ply == depth or board.isTerminal():
+                continue
+            for pitnum in movesFromMask(board.legalMoves(player)):
+                getsTurn, undo = board.makeMove(player, pitnum)
+                following.append((board.getPits(), player if getsTurn else (player+1)%2))
+                board.unmakeMove(undo)
+        frontier = following
+
+    searchers = [AlphaBetaPlayer(0, sys.maxint, searchDepth),
+                 AlphaBetaPlayer(1, sys.maxint, searchDepth)]
+    entries = []
+    start = time.time()
+    for key, (pits, player) in sorted(positions.items()):
+        board.setPits(pits)
+        if board.isTerminal():
+            continue
+        move = searchers[player].getMove(board)
+        entries.append(key + chr(move - 1))
+    if report:
+        print "%d positions to depth %d searched in %.1fs" % (len(entries), depth, time.time() - start)
+
+    f = open(filename, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, rowSize, len(entries)))
+    f.write(''.join(entries))
+    f.close()
+
+class OpeningBook(object):
+    """ reads a book written by buildBook into a dict from packed position
+    to the pit to play """
+
+    def __init__(self, filename):
+        f = open(filename, 'rb')
+        magic, version, rowSize, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            f.close()
+            raise ValueError("%s is not an opening book" % filename)
+        if version != VERSION:
+            f.close()
+            raise ValueError("unsupported book version %d in %s" % (version, filename))
+        data = f.read()
+        f.close()
+
+        self.rowSize = rowSize
+        self.moves = {}
+        width = 2 * rowSize + 4     # counts, player to move, move
+        for i in range(count):
+            entry = data[i*width:(i+1)*width]
+            self.moves[entry[:-1]] = ord(entry[-1])
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, board, player):
+        """ returns the pit index to play from the book, or None """
+        self.probes += 1
+        if board.rowSize != self.rowSize:
+            return None
+        pitnum = self.moves.get(_positionKey(board.getPits(), player))
+        if pitnum is not None:
+            self.hits += 1
+        return pitnum
+
+class BookPlayer(Player):
+    """ plays the book move while the game is in the opening book and lets
+    the wrapped player choose once it is out of book """
+
+    def __init__(self, player, book):
+        self.player = player
+        self.book = book
+        self.id = player.id
+
+    def setID(self, id):
+        result = self.player.setID(id)
+        self.id = self.player.id
+        return result
+
+    def getMove(self, board):
+        """ returns the book move, or the wrapped player's move """
+        pitnum = self.book.probe(board, self.id)
+        if pitnum is not None:
+            return pitnum + 1
+        return self.player.getMove(board)
+
+    def gameOver(self, myScore, oppScore):
+        """ passes the result on to the wrapped player """
+        self.player.gameOver(myScore, oppScore)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print "usage: book.py opening.book [depth] [searchDepth]"
+        sys.exit(1)
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    searchDepth = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    buildBook(sys.argv[1], depth, searchDepth, report=True)
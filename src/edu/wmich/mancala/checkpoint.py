@@ -0,0 +1,253 @@
+#coding:utf-8
+'''
+Created on May 12, 2010
+
+@author: changwang
+'''
+
+import json
+import os
+import Queue
+import re
+import struct
+import sys
+import threading
+import time
+
+import numpy
+
+MAGIC = 'MNCLNET\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIII')   # magic, version, input size, hidden size, settings length
+ALIGNMENT = 16
+DTYPE = numpy.dtype('<f8')
+
+# order of the NNPlayer settings lines in the legacy text files
+LEGACY_SETTINGS = [
+    ('id', int),
+    ('rowSize', int),
+    ('stones', int),
+    ('inputSize', int),
+    ('strategy', str),
+    ('learn', lambda s: s == 'True'),
+    ('alpha', float),
+    ('discount', float),
+    ('numIterations', int),
+    ('numRecent', int),
+]
+
+def _dataOffset(settingsLength):
+    """ weights start at the first aligned offset after the settings """
+    end = HEADER.size + settingsLength
+    return (end + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def writeCheckpoint(filename, inputSize, hiddenSize, weights, hiddenWeights, settings=None):
+    """ writes network weights and an optional dict of settings in the
+    binary checkpoint format:
+
+        header      magic, version, input size, hidden size, settings length
+        settings    utf-8 json, zero padded to a 16 byte boundary
+        weights     hiddenSize+1 little endian doubles, hidden to output
+        hidden      (inputSize+1) x (hiddenSize+1) doubles, input to hidden
+    """
+    blob = json.dumps(settings or {}, sort_keys=True).encode('utf-8')
+    offset = _dataOffset(len(blob))
+    f = open(filename, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, inputSize, hiddenSize, len(blob)))
+    f.write(blob)
+    f.write('\0' * (offset - HEADER.size - len(blob)))
+    f.write(numpy.ascontiguousarray(weights, dtype=DTYPE).tostring())
+    f.write(numpy.ascontiguousarray(hiddenWeights, dtype=DTYPE).tostring())
+    f.flush()
+    f.close()
+
+def readCheckpoint(filename, mmap=True):
+    """ reads a binary checkpoint, returns a dict with inputSize, hiddenSize,
+    weights, hiddenWeights and settings. with mmap the weight arrays are
+    read-only views of the file, so processes loading the same file share
+    one copy of the weights in the page cache """
+    f = open(filename, 'rb')
+    magic, version, inputSize, hiddenSize, length = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        f.close()
+        raise ValueError("%s is not a network checkpoint" % filename)
+    if version != VERSION:
+        f.close()
+        raise ValueError("unsupported checkpoint version %d in %s" % (version, filename))
+    settings = json.loads(f.read(length).decode('utf-8'))
+
+    offset = _dataOffset(length)
+    shapes = [(hiddenSize + 1,), (inputSize + 1, hiddenSize + 1)]
+    arrays = []
+    for shape in shapes:
+        if mmap:
+            arrays.append(numpy.memmap(filename, dtype=DTYPE, mode='r', offset=offset, shape=shape))
+        else:
+            f.seek(offset)
+            count = int(numpy.prod(shape))
+            arrays.append(numpy.fromfile(f, dtype=DTYPE, count=count).reshape(shape))
+        offset += int(numpy.prod(shape)) * DTYPE.itemsize
+    f.close()
+
+    return {
+        'inputSize': inputSize,
+        'hiddenSize': hiddenSize,
+        'weights': arrays[0],
+        'hiddenWeights': arrays[1],
+        'settings': settings,
+    }
+
+def readLegacy(filename):
+    """ parses a text weight file written by NeuralNet.saveToFile, with the
+    NNPlayer settings lines if NNPlayer.saveToFile appended them """
+    f = open(filename, 'r')
+    lines = [line.strip() for line in f.readlines()]
+    f.close()
+
+    inputSize = int(lines[0])
+    hiddenSize = int(lines[1])
+    weights = [float(w) for w in lines[2].split(',')[:-1]]
+    hiddenWeights = [[float(hw) for hw in line.split(',')[:-1]]
+                     for line in lines[3:inputSize+4]]
+
+    settings = {}
+    rest = [line for line in lines[inputSize+4:] if line]
+    for (key, parse), value in zip(LEGACY_SETTINGS, rest):
+        settings[key] = parse(value)
+
+    return {
+        'inputSize': inputSize,
+        'hiddenSize': hiddenSize,
+        'weights': numpy.array(weights),
+        'hiddenWeights': numpy.array(hiddenWeights),
+        'settings': settings,
+    }
+
+def convertLegacy(textfile, binfile):
+    """ converts a legacy text weight file into a binary checkpoint """
+    data = readLegacy(textfile)
+    writeCheckpoint(binfile, data['inputSize'], data['hiddenSize'],
+                    data['weights'], data['hiddenWeights'], data['settings'])
+
+def _trainingName(prefix, step):
+    return "%s-%010d.npz" % (prefix, step)
+
+def listTrainingCheckpoints(directory, prefix='train'):
+    """ returns (step, filename) of every training checkpoint in directory,
+    oldest first """
+    pattern = re.compile(r'^%s-(\d+)\.npz$' % re.escape(prefix))
+    found = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+def latestTrainingCheckpoint(directory, prefix='train'):
+    """ returns the filename of the newest training checkpoint, or None """
+    found = listTrainingCheckpoints(directory, prefix)
+    if not found:
+        return None
+    return found[-1][1]
+
+def writeTrainingCheckpoint(filename, step, arrays, settings):
+    """ writes a training snapshot, a dict of numpy arrays and a dict of
+    json values, as an npz file. it is written under a temporary name,
+    synced and renamed, so filename is either complete or absent """
+    data = dict(arrays)
+    data['settings'] = numpy.array(json.dumps({'step': step, 'settings': settings}, sort_keys=True))
+    temp = filename + '.tmp'
+    f = open(temp, 'wb')
+    try:
+        numpy.savez(f, **data)
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+    os.rename(temp, filename)
+
+def readTrainingCheckpoint(filename):
+    """ reads a file written by writeTrainingCheckpoint, returns
+    (step, arrays, settings) """
+    data = numpy.load(filename)
+    try:
+        header = json.loads(str(data['settings']))
+        arrays = dict((key, data[key]) for key in data.files if key != 'settings')
+    finally:
+        data.close()
+    return header['step'], arrays, header['settings']
+
+class BackgroundCheckpointer(object):
+    """ writes training snapshots from a background thread, so the training
+    loop only pays for copying its state. the newest keep checkpoints in
+    directory are kept, older ones are deleted. at most one snapshot waits
+    while another is written, a save after that blocks until it is taken.
+    an error in the writer is raised by the next save, flush or close """
+
+    def __init__(self, directory, keep=3, prefix='train'):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.keep = keep
+        self.prefix = prefix
+        self.queue = Queue.Queue(maxsize=1)
+        self.error = None
+        self.saves = 0
+        self.blockedSeconds = 0.0   # time save spent waiting for the writer
+        self.writeSeconds = 0.0     # time the writer spent writing
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def save(self, step, arrays, settings):
+        """ queues a snapshot taken at step for writing """
+        self._raiseError()
+        start = time.time()
+        self.queue.put((step, arrays, settings))
+        self.blockedSeconds += time.time() - start
+        self.saves += 1
+
+    def flush(self):
+        """ waits until every queued snapshot is written """
+        self.queue.join()
+        self._raiseError()
+
+    def close(self):
+        self.queue.join()
+        self.queue.put(None)
+        self.thread.join()
+        self._raiseError()
+
+    def _raiseError(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                start = time.time()
+                step, arrays, settings = item
+                filename = os.path.join(self.directory, _trainingName(self.prefix, step))
+                writeTrainingCheckpoint(filename, step, arrays, settings)
+                self._rotate()
+                self.writeSeconds += time.time() - start
+            except Exception, e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _rotate(self):
+        found = listTrainingCheckpoints(self.directory, self.prefix)
+        for step, filename in found[:max(0, len(found) - self.keep)]:
+            os.remove(filename)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print "usage: checkpoint.py weights.txt weights.bin"
+        sys.exit(1)
+    convertLegacy(sys.argv[1], sys.argv[2])
@@ -0,0 +1,185 @@
+#coding:utf-8
+'''
+Created on Jun 12, 2010
+
+@author: changwang
+'''
+
+import os
+import Queue
+import random
+import sys
+import time
+from array import array
+from multiprocessing import Process, Queue as ProcessQueue, Event, cpu_count
+
+import numpy
+
+from arrayboard import ArrayMancalaBoard
+from player import NNPlayer, Pair
+
+def _replace(filename, write):
+    """ calls write on a temporary name next to filename and renames it over
+    filename, so a reader sees either the old or the new file, never one
+    being written """
+    temp = "%s.%d.tmp" % (filename, os.getpid())
+    write(temp)
+    os.rename(temp, filename)
+
+def _writeVersion(filename, version):
+    f = open(filename, 'w')
+    f.write("%d\n" % version)
+    f.close()
+
+def publishWeights(player, filename, version):
+    """ replaces filename with the player's checkpoint, then filename.version
+    with the version number. the weights are in place before the number
+    changes, so a reader that sees a new version loads at least that
+    version's weights """
+    _replace(filename, player.saveCheckpoint)
+    _replace(filename + '.version', lambda temp: _writeVersion(temp, version))
+
+def publishedVersion(filename):
+    """ the version number of the weights last published to filename """
+    f = open(filename + '.version', 'r')
+    version = int(f.read())
+    f.close()
+    return version
+
+def playTranscripts(players, board):
+    """ plays one game between the two players without letting them learn
+    and returns both transcripts: a list of (state, action) pairs, the
+    state as a byte string, followed by the final reward of that side """
+    id = 0
+    while not board.isGameOver():
+        move = players[id].getMove(board)
+        if not board.playPit(id, move - 1):
+            id = (id+1)%2
+    scores = [board.stonesInMyMancala(0), board.stonesInMyMancala(1)]
+
+    transcripts = []
+    for player in players:
+        moves = player.movelist[player.id]
+        player.movelist[player.id] = []
+        transcript = [(pair.state.tostring(), pair.action) for pair in moves]
+        transcript.append(float(scores[player.id] - scores[(player.id+1)%2]))
+        transcripts.append(transcript)
+    return transcripts
+
+def toMovelist(transcript):
+    """ turns a transcript back into the move list NNPlayer learns from """
+    moves = [Pair(array('B', state), action) for state, action in transcript[:-1]]
+    moves.append(transcript[-1])
+    return moves
+
+def actor(number, weightsFile, queue, stop, seed, strategy='weighted'):
+    """ actor process: plays self-play games with a read-only copy of the
+    published weights and puts the transcripts on queue. the weights are
+    reloaded between games whenever the learner has published new ones """
+    random.seed(seed)
+    numpy.random.seed(seed)
+    players = [NNPlayer(0), NNPlayer(1)]
+    version = None
+    while not stop.is_set():
+        current = publishedVersion(weightsFile)
+        if current != version:
+            players[0].loadCheckpoint(weightsFile, shared=True)
+            players[0].setID(0)
+            players[1].Q = players[0].Q
+            for player in players:
+                player.setLearning(False)
+                player.setStrategy(strategy)
+            version = current
+
+        transcripts = playTranscripts(players, ArrayMancalaBoard())
+        while not stop.is_set():
+            try:
+                queue.put((number, transcripts), timeout=0.1)
+                break
+            except Queue.Full:
+                pass
+
+def train(weightsFile, numGames, numActors=None, publishEvery=50, seed=0,
+          strategy='weighted', learner=None, report=False):
+    """ trains learner (a fresh NNPlayer if None) on numGames games played
+    by numActors actor processes. both transcripts of every game are
+    learned from, and the weights are published to weightsFile every
+    publishEvery games. returns the learner and the throughput numbers """
+    if numActors is None:
+        numActors = max(1, cpu_count() - 1)
+    if learner is None:
+        learner = NNPlayer(0)
+    learner.setLearning(True)
+    publishes = 1
+    publishWeights(learner, weightsFile, publishes)
+
+    queue = ProcessQueue(maxsize=numActors * 16)
+    stop = Event()
+    actors = []
+    for i in range(numActors):
+        process = Process(target=actor, args=(i, weightsFile, queue, stop, seed + i, strategy))
+        process.daemon = True
+        process.start()
+        actors.append(process)
+
+    games = 0
+    perActor = [0] * numActors
+    start = time.time()
+    learnTime = 0.0
+    try:
+        while games < numGames:
+            try:
+                number, transcripts = queue.get(timeout=1.0)
+            except Queue.Empty:
+                # a crashed actor sends nothing, do not wait for it forever
+                if not any(process.is_alive() for process in actors):
+                    raise RuntimeError("every actor process has exited")
+                continue
+            learnStart = time.time()
+            for transcript in transcripts:
+                learner._updateGameRecord(toMovelist(transcript))
+                learner._learnFromGameRecord()
+            learnTime += time.time() - learnStart
+            games += 1
+            perActor[number] += 1
+            if games % publishEvery == 0:
+                publishes += 1
+                publishWeights(learner, weightsFile, publishes)
+                if report:
+                    elapsed = time.time() - start
+                    print "%d games, %.1f games/s, learner busy %.0f%%" % \
+                          (games, games / elapsed, 100.0 * learnTime / elapsed)
+    finally:
+        stop.set()
+        # empty the queue so no actor stays blocked on a full one
+        while any(process.is_alive() for process in actors):
+            try:
+                queue.get(timeout=0.1)
+            except Queue.Empty:
+                pass
+        for process in actors:
+            process.join()
+    publishes += 1
+    publishWeights(learner, weightsFile, publishes)
+
+    elapsed = time.time() - start
+    return learner, {
+        'games': games,
+        'seconds': elapsed,
+        'gamesPerSecond': games / elapsed if elapsed > 0 else 0.0,
+        'learnerBusy': learnTime / elapsed if elapsed > 0 else 0.0,
+        'publishes': publishes,
+        'gamesPerActor': perActor,
+    }
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print "usage: distributed.py weights.ckpt games [actors] [publishEvery]"
+        sys.exit(1)
+    weightsFile, games = sys.argv[1], int(sys.argv[2])
+    actors = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    publishEvery = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    learner, stats = train(weightsFile, games, actors, publishEvery, report=True)
+    print "%d games in %.1fs (%.1f games/s) by %d actors, learner busy %.0f%%" % \
+          (stats['games'], stats['seconds'], stats['gamesPerSecond'],
+           len(stats['gamesPerActor']), 100.0 * stats['learnerBusy'])
@@ -0,0 +1,90 @@
+#coding:utf-8
+'''
+Created on Jun 16, 2010
+
+@author: changwang
+'''
+
+import numpy
+
+from arrayboard import ArrayMancalaBoard
+
+class StateEncoder(object):
+    """ writes network inputs for boards straight into preallocated float
+    buffers. a state is the 2*rowSize+2 counts, normalized to the point of
+    view of the player to encode for: own mancala, own row, opponent's
+    mancala, opponent's row. without normalization every state is in
+    board order. the action rows put the pit index in front of the state,
+    one row per pit, as NNPlayer feeds its network. the returned arrays
+    are views of the buffers and are overwritten by the next call """
+
+    def __init__(self, rowSize=6, capacity=1, normalize=True):
+        self.rowSize = rowSize
+        self.stateSize = 2 * rowSize + 2
+        self.inputSize = self.stateSize + 1
+        self.normalize = normalize
+
+        # board order positions of the state entries, for each player
+        n = rowSize
+        bottom = [n] + range(n) + [2*n+1] + range(n+1, 2*n+1)
+        top = [2*n+1] + range(n+1, 2*n+1) + [n] + range(n)
+        if normalize:
+            self.order = [numpy.array(bottom), numpy.array(top)]
+        else:
+            self.order = [numpy.arange(self.stateSize)] * 2
+
+        self.counts = numpy.empty(self.stateSize)   # one board in board order
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.states = numpy.empty((capacity, self.stateSize))
+        self.rows = numpy.empty((capacity, self.rowSize, self.inputSize))
+        self.rows[:, :, 0] = numpy.arange(self.rowSize)
+
+    def _reserve(self, count):
+        if count > self.capacity:
+            self._allocate(max(count, 2 * self.capacity))
+
+    def _readCounts(self, board):
+        """ copies every count of board into self.counts in board order """
+        if isinstance(board, ArrayMancalaBoard):
+            self.counts[:] = board.pits
+        else:
+            self.counts[:] = board.getPits()
+        return self.counts
+
+    def encodeState(self, board, player, out=None):
+        """ writes the state of board for player into out, or the first
+        state row, and returns it """
+        if out is None:
+            out = self.states[0]
+        numpy.take(self._readCounts(board), self.order[player], out=out, mode='clip')
+        return out
+
+    def encodeStates(self, boards, players):
+        """ writes the states of several boards, boards[i] for players[i],
+        and returns them as a (len(boards), stateSize) array """
+        count = len(boards)
+        self._reserve(count)
+        for i in range(count):
+            numpy.take(self._readCounts(boards[i]), self.order[players[i]], out=self.states[i], mode='clip')
+        return self.states[:count]
+
+    def actionRows(self, states):
+        """ returns the action rows of one state or an array of states, a
+        (rowSize, inputSize) array for one state and a
+        (len(states) * rowSize, inputSize) array for several """
+        states = numpy.asarray(states)
+        if states.ndim == 1:
+            rows = self.rows[0]
+            rows[:, 1:] = states[:self.stateSize]
+            return rows
+        count = len(states)
+        self._reserve(count)
+        self.rows[:count, :, 1:] = states[:, None, :self.stateSize]
+        return self.rows[:count].reshape(count * self.rowSize, self.inputSize)
+
+    def encodeActions(self, boards, players):
+        """ the action rows of several boards, boards[i] for players[i] """
+        return self.actionRows(self.encodeStates(boards, players))
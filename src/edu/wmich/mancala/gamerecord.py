@@ -0,0 +1,122 @@
+#coding:utf-8
+'''
+Created on Jun 4, 2010
+
+@author: changwang
+'''
+
+import os
+import struct
+import sys
+
+MAGIC = 'MNCLGAME'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sHB')    # magic, version, row size
+GAME_HEADER = struct.Struct('<HbBB')    # positions, winner (-1 tie), score of player 0, of player 1
+
+class Position(object):
+    """ one recorded position: the pit counts in board order (bottom row,
+    bottom mancala, top row, top mancala), the player to move and the pit
+    index it played """
+    __slots__ = ('counts', 'player', 'action')
+
+    def __init__(self, counts, player, action):
+        self.counts = counts
+        self.player = player
+        self.action = action
+
+    def __repr__(self):
+        return "(p=%d, a=%d, s=%s)" % (self.player, self.action, list(self.counts))
+
+class Game(object):
+    """ one recorded game and its result """
+    __slots__ = ('winner', 'scores', 'positions')
+
+    def __init__(self, winner, scores, positions):
+        self.winner = winner
+        self.scores = scores
+        self.positions = positions
+
+def _counts(board):
+    """ packs every pit count of board into a bytearray """
+    return bytearray(board.mySide(0) + [board.stonesInMyMancala(0)] +
+                     board.mySide(1) + [board.stonesInMyMancala(1)])
+
+class GameRecordWriter(object):
+    """ appends games to a record file. a game is buffered in memory while
+    it is played and written in one piece by endGame, so a reader never
+    sees half a game """
+
+    def __init__(self, filename, rowSize=6):
+        self.rowSize = rowSize
+        exists = os.path.exists(filename) and os.path.getsize(filename) > 0
+        if exists:
+            f = open(filename, 'rb')
+            magic, version, fileRowSize = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            f.close()
+            if magic != MAGIC or version != VERSION or fileRowSize != rowSize:
+                raise ValueError("%s is not a compatible game record file" % filename)
+        self.file = open(filename, 'ab')
+        if not exists:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, rowSize))
+        self.positions = []
+
+    def addPosition(self, board, player, pitnum):
+        """ records that player plays pitnum (0 to rowSize-1) on board,
+        call it before the move is made """
+        self.positions.append(str(_counts(board) + bytearray([player, pitnum])))
+
+    def endGame(self, board):
+        """ writes the buffered game with the final result of board """
+        scores = [board.stonesInMyMancala(0), board.stonesInMyMancala(1)]
+        self.file.write(GAME_HEADER.pack(len(self.positions), board.winner(), scores[0], scores[1]))
+        self.file.write(''.join(self.positions))
+        self.file.flush()
+        self.positions = []
+
+    def close(self):
+        self.file.close()
+
+def readGames(filename):
+    """ yields every Game in the file, one at a time """
+    f = open(filename, 'rb')
+    try:
+        magic, version, rowSize = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a game record file" % filename)
+        if version != VERSION:
+            raise ValueError("unsupported game record version %d in %s" % (version, filename))
+        width = 2 * rowSize + 4     # counts, player, action
+        while True:
+            header = f.read(GAME_HEADER.size)
+            if len(header) < GAME_HEADER.size:
+                return
+            count, winner, score0, score1 = GAME_HEADER.unpack(header)
+            data = bytearray(f.read(count * width))
+            positions = []
+            for i in range(count):
+                entry = data[i*width:(i+1)*width]
+                positions.append(Position(entry[:-2], entry[-2], entry[-1]))
+            yield Game(winner, (score0, score1), positions)
+    finally:
+        f.close()
+
+def readPositions(filename):
+    """ yields (position, game) for every position in the file """
+    for game in readGames(filename):
+        for position in game.positions:
+            yield position, game
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print "usage: gamerecord.py games.rec"
+        sys.exit(1)
+    games = 0
+    positions = 0
+    wins = [0, 0, 0]
+    for game in readGames(sys.argv[1]):
+        games += 1
+        positions += len(game.positions)
+        wins[game.winner] += 1
+    print "%d games, %d positions" % (games, positions)
+    print "player 0 won %d, player 1 won %d, %d ties" % (wins[0], wins[1], wins[-1])
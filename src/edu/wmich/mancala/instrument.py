@@ -0,0 +1,183 @@
+#coding:utf-8
+'''
+Created on Jun 1, 2010
+
+@author: changwang
+'''
+
+import cProfile
+import json
+import time
+
+from mancala import MancalaBoard
+from arrayboard import ArrayMancalaBoard
+from player import Player, NNPlayer
+import runner
+
+# (class, method) pairs timed while instrumentation is enabled
+HOT_PATHS = [
+    (NNPlayer, '_getState'),
+    (NNPlayer, '_getQvals'),
+    (NNPlayer, '_getStateQvals'),
+    (NNPlayer, '_learnFromGameRecord'),
+    (NNPlayer, '_learnOnline'),         # TD(lambda) learning, every move
+    (NNPlayer, 'gameOver'),             # TD(lambda) final update and game records
+    (MancalaBoard, 'playPit'),
+    (ArrayMancalaBoard, 'playPit'),
+]
+
+# upper bounds of the move latency histogram buckets, in seconds
+BUCKETS = [0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0]
+
+class _Timer(object):
+    """ call counter and cumulative time of one hot function """
+    __slots__ = ('calls', 'seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+class _Histogram(object):
+    """ move latency histogram of one player class """
+    __slots__ = ('counts', 'total', 'seconds', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0
+        self.seconds = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += 1
+        self.seconds += seconds
+        self.maximum = max(self.maximum, seconds)
+
+_timers = {}
+_histograms = {}
+_originals = {}     # (class, name) -> the function replaced while enabled
+
+def _timed(key, function):
+    timer = _timers.setdefault(key, _Timer())
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timer.calls += 1
+            timer.seconds += time.time() - start
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+def _timedMove(function):
+    def wrapper(self, board):
+        start = time.time()
+        try:
+            return function(self, board)
+        finally:
+            name = type(self).__name__
+            histogram = _histograms.get(name)
+            if histogram is None:
+                histogram = _histograms[name] = _Histogram()
+            histogram.add(time.time() - start)
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+def _allPlayerClasses():
+    """ every loaded Player subclass """
+    found = []
+    pending = [Player]
+    while pending:
+        cls = pending.pop()
+        for sub in cls.__subclasses__():
+            if sub not in found:
+                found.append(sub)
+                pending.append(sub)
+    return found
+
+def isEnabled():
+    return len(_originals) > 0
+
+def enable():
+    """ wraps the hot functions and every player's getMove with timers.
+    nothing is wrapped while disabled, so it costs nothing then """
+    if isEnabled():
+        return
+    # check every hot path first, so a missing one leaves nothing wrapped
+    missing = ["%s.%s" % (cls.__name__, name) for cls, name in HOT_PATHS if name not in cls.__dict__]
+    if missing:
+        raise ValueError("hot paths not found: %s" % ", ".join(missing))
+    for cls, name in HOT_PATHS:
+        function = cls.__dict__[name]
+        _originals[(cls, name)] = function
+        setattr(cls, name, _timed("%s.%s" % (cls.__name__, name), function))
+    for cls in _allPlayerClasses():
+        if 'getMove' in cls.__dict__:
+            function = cls.__dict__['getMove']
+            _originals[(cls, 'getMove')] = function
+            setattr(cls, 'getMove', _timedMove(function))
+
+def disable():
+    """ puts the original functions back, the collected numbers are kept """
+    for (cls, name), function in _originals.items():
+        setattr(cls, name, function)
+    _originals.clear()
+
+def reset():
+    """ forgets every collected number """
+    _timers.clear()
+    _histograms.clear()
+
+def snapshot():
+    """ returns the collected numbers as a dict """
+    functions = {}
+    for key, timer in _timers.items():
+        functions[key] = {
+            'calls': timer.calls,
+            'seconds': timer.seconds,
+            'microsecondsPerCall': timer.seconds / timer.calls * 1e6 if timer.calls else 0.0,
+        }
+    moves = {}
+    for name, histogram in _histograms.items():
+        moves[name] = {
+            'moves': histogram.total,
+            'meanSeconds': histogram.seconds / histogram.total if histogram.total else 0.0,
+            'maxSeconds': histogram.maximum,
+            'bucketUpperBounds': BUCKETS + [None],
+            'counts': list(histogram.counts),
+        }
+    return {'functions': functions, 'moves': moves}
+
+def export(filename):
+    """ writes the snapshot to filename as JSON """
+    f = open(filename, 'w')
+    json.dump(snapshot(), f, indent=2, sort_keys=True)
+    f.close()
+
+def profileMatch(statsFile, type0, type1, numGames, seed=0):
+    """ plays a match in this process under cProfile, dumps the stats to
+    statsFile for pstats and returns the match results """
+    profiler = cProfile.Profile()
+    results = profiler.runcall(runner.playGames, type0, type1, numGames, seed)
+    profiler.dump_stats(statsFile)
+    return results
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 4:
+        print "usage: instrument.py type0 type1 games [snapshot.json] [profile.stats]"
+        sys.exit(1)
+    type0, type1, games = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    if len(sys.argv) > 5:
+        profileMatch(sys.argv[5], type0, type1, games)
+    enable()
+    runner.playGames(type0, type1, games, 0)
+    disable()
+    if len(sys.argv) > 4:
+        export(sys.argv[4])
+    else:
+        print json.dumps(snapshot(), indent=2, sort_keys=True)
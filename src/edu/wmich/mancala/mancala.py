@@ -56,6 +56,8 @@ class MancalaBoard(object):
         self.topMancala = None
         self.bottomMancala = None
         
+        self.totals = None  # stones on each player's side, kept up to date
+        
         self.setupBoard()
         
     def setupBoard(self):
@@ -95,6 +97,42 @@ class MancalaBoard(object):
             if i != 0:
                 self.top[i].clockwise = self.top[i-1]
                 self.bottom[i].clockwise = self.bottom[i-1]
+        
+        self._countSides()
+    
+    def _countSides(self):
+        """ recomputes the side totals from the pits """
+        self.totals = [0, 0]
+        for player in range(2):
+            for pit in self.board[player]:
+                self.totals[player] += pit.stones
+    
+    def getPits(self):
+        """ returns every count in board order: bottom row, bottom mancala,
+        top row, top mancala """
+        return self.mySide(0) + [self.bottomMancala.stones] + \
+               self.mySide(1) + [self.topMancala.stones]
+    
+    def setPits(self, pits):
+        """ sets every count from a list in getPits order """
+        n = self.rowSize
+        for i in range(n):
+            self.bottom[i].stones = pits[i]
+            self.top[i].stones = pits[n+1+i]
+        self.bottomMancala.stones = pits[n]
+        self.topMancala.stones = pits[2*n+1]
+        self._countSides()
+    
+    def legalMoves(self, player):
+        """ returns the bitmask of player's non-empty pits, bit i for pit i.
+        like ArrayMancalaBoard it is built from the pits on each call """
+        mask = 0
+        bit = 1
+        for pit in self.board[player]:
+            if pit.stones:
+                mask |= bit
+            bit <<= 1
+        return mask
     
     def mySide(self, player):
         """ returns a list of pits count on player's side """
@@ -114,40 +152,86 @@ class MancalaBoard(object):
         
     def playPit(self, player, pitnum):
         """ plays the pits, return true if the player gets another turn """
+        return self.makeMove(player, pitnum)[0]
+    
+    def makeMove(self, player, pitnum):
+        """ plays the pits like playPit, returns (getsTurn, undo) where
+        undo can be passed to unmakeMove to take the move back """
         pit = self.board[player][pitnum]
-        if pit.stones == 0:
-            return True
-        for s in range(pit.pickup()):
+        stones = pit.stones
+        if stones == 0:
+            return True, (player, pitnum, 0, None, 0, None)
+        totals = self.totals
+        counts = (totals[0], totals[1])
+        
+        pit.pickup()
+        totals[player] -= stones
+        for s in range(stones):
             pit = pit.counterclock
             if pit.isOppMancala(player):
-                pit = pit.clockwise
+                pit = pit.counterclock # skip over opponent's mancala
             pit.drop()
+            if not pit.isMancala:
+                totals[pit.player] += 1
             
+        captured = 0
         if pit.stones == 1 and pit.isPlayersPit(player) and pit.across.stones > 0:
+            captured = pit.across.stones
             self.mancala[player].dropAll(pit.pickup() + pit.across.pickup())
+            opp = (player+1)%2
+            totals[player] -= 1
+            totals[opp] -= captured
             
-        if pit.isMyMancala(player):
-            return True
-        else:
-            return False
+        return pit.isMyMancala(player), (player, pitnum, stones, pit, captured, counts)
+    
+    def unmakeMove(self, undo):
+        """ takes back the move that returned undo from makeMove, moves
+        must be taken back in reverse order """
+        player, pitnum, stones, last, captured, counts = undo
+        if stones == 0:
+            return
+        self.totals = [counts[0], counts[1]]
+        if captured:
+            self.mancala[player].stones -= captured + 1
+            last.stones = 1
+            last.across.stones = captured
+        pit = start = self.board[player][pitnum]
+        for s in range(stones):
+            pit = pit.counterclock
+            if pit.isOppMancala(player):
+                pit = pit.counterclock
+            pit.stones -= 1
+        start.stones = stones
         
     def inPlay(self, player):
         """ returns the number of stones on the player's side
         (excluding those in the mancala) """
-        return sum([pit.stones for pit in self.board[player]])
+        return self.totals[player]
     
     def isGameOver(self):
         """ checks if at least one side is clear """
-        plays = [self.inPlay(0), self.inPlay(1)]
+        plays = self.totals
         if plays[0] == 0 or plays[1] == 0:
             self.bottomMancala.dropAll(plays[0])
             self.topMancala.dropAll(plays[1])
             for i in range(self.rowSize):
                 self.top[i].pickup()
                 self.bottom[i].pickup()
+            self.totals = [0, 0]
             return True
         return False
     
+    def isTerminal(self):
+        """ checks if at least one side is clear, without touching the board """
+        return self.totals[0] == 0 or self.totals[1] == 0
+    
+    def finalScore(self):
+        """ returns the score of both players if the game ended now, with
+        the stones left on each side counted for that side's mancala,
+        without touching the board """
+        return (self.stonesInMyMancala(0) + self.inPlay(0),
+                self.stonesInMyMancala(1) + self.inPlay(1))
+    
     def winner(self):
         """ returns the player id with the most stones in the mancala """
         if self.stonesInMyMancala(0) > self.stonesInMyMancala(1):
@@ -0,0 +1,251 @@
+#coding:utf-8
+'''
+Created on May 25, 2010
+
+@author: changwang
+'''
+
+import inspect
+import math
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+from arrayboard import ArrayMancalaBoard
+from player import Player, movesFromMask
+from pooltask import callTask
+
+def randomRollout(board, player, rng=random):
+    """ default rollout policy, plays a uniformly random non-empty pit """
+    return rng.choice(movesFromMask(board.legalMoves(player)))
+
+def simpleRollout(board, player, rng=None):
+    """ rollout policy that plays the non-empty pit closest to the mancala """
+    return board.legalMoves(player).bit_length() - 1
+
+class Node(object):
+    """ a node of the search tree, holding the result of the games through
+    it for the player who made the move leading here """
+    __slots__ = ('move', 'mover', 'toMove', 'parent', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, mover, toMove, parent):
+        self.move = move        # pit played to reach this node
+        self.mover = mover      # player who played it
+        self.toMove = toMove    # player to move from here
+        self.parent = parent
+        self.children = []
+        self.untried = None     # legal pits not expanded yet
+        self.visits = 0.0
+        self.wins = 0.0
+
+def _priorValues(prior, board, player, moves):
+    """ scales the NNPlayer Q values of moves for player to [0, 1] """
+    qVals = prior._getStateQvals(prior.encoder.encodeState(board, player))
+    values = [qVals[m] for m in moves]
+    low, high = min(values), max(values)
+    if high == low:
+        return [0.5] * len(moves)
+    return [(v - low) / (high - low) for v in values]
+
+def searchTree(pits, player, rowSize, stonePerPit, playouts, timeLimit, seed,
+               policy=randomRollout, prior=None, priorWeight=10.0, exploration=1.4):
+    """ grows one UCT tree from the position for the given number of
+    playouts or until timeLimit seconds have passed, whichever comes first
+    (None means no limit, but not for both). the search draws from its own
+    generator seeded with seed, which is passed on to the rollout policy.
+    returns ({move: (visits, wins)}, playouts) for the root's children """
+    rng = random.Random(seed)
+    board = ArrayMancalaBoard(rowSize, stonePerPit)
+    scratch = ArrayMancalaBoard(rowSize, stonePerPit)
+    board.setPits(pits)
+    root = Node(None, None, player, None)
+
+    deadline = time.time() + timeLimit if timeLimit is not None else None
+    count = 0
+    while (playouts is None or count < playouts) and \
+          (deadline is None or time.time() < deadline):
+        node = root
+        undos = []
+
+        # selection, down fully expanded nodes
+        while node.untried is not None and not node.untried and node.children:
+            logVisits = math.log(node.visits)
+            node = max(node.children, key=lambda c: c.wins / c.visits +
+                       exploration * math.sqrt(logVisits / c.visits))
+            undos.append(board.makeMove(node.mover, node.move)[1])
+
+        # expansion of one untried move
+        if not board.isTerminal():
+            if node.untried is None:
+                node.untried = list(movesFromMask(board.legalMoves(node.toMove)))
+                priors = None
+                if prior is not None:
+                    priors = _priorValues(prior, board, node.toMove, node.untried)
+                node.untried = zip(node.untried, priors or [None] * len(node.untried))
+                rng.shuffle(node.untried)
+            move, value = node.untried.pop()
+            mover = node.toMove
+            getsTurn, undo = board.makeMove(mover, move)
+            undos.append(undo)
+            child = Node(move, mover, mover if getsTurn else (mover+1)%2, node)
+            if value is not None:
+                child.visits = priorWeight
+                child.wins = priorWeight * value
+            node.children.append(child)
+            node = child
+
+        # rollout on a copy, so the tree path can be taken back
+        scratch.setPits(board.pits)
+        toMove = node.toMove
+        while not scratch.isTerminal():
+            if not scratch.playPit(toMove, policy(scratch, toMove, rng)):
+                toMove = (toMove+1)%2
+        score = scratch.finalScore()
+        if score[0] > score[1]:
+            result = [1.0, 0.0]
+        elif score[0] < score[1]:
+            result = [0.0, 1.0]
+        else:
+            result = [0.5, 0.5]
+
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if node.mover is not None:
+                node.wins += result[node.mover]
+            node = node.parent
+        for undo in reversed(undos):
+            board.unmakeMove(undo)
+        count += 1
+
+    stats = {}
+    for child in root.children:
+        stats[child.move] = (child.visits, child.wins)
+    return stats, count
+
+class MCTSPlayer(Player):
+    """ a player using Monte Carlo tree search with UCT selection. with
+    several workers every process grows its own tree from the position
+    (root parallelization) and the root statistics are summed """
+
+    def __init__(self, id, playouts=2000, timeLimit=None, numWorkers=1):
+        self.setID(id)
+        self.playouts = None        # total playouts per move, None for no limit
+        self.timeLimit = None       # seconds per move, None for no limit
+        self.setLimits(playouts, timeLimit)
+        self.numWorkers = numWorkers
+        self.policy = None
+        self.setRolloutPolicy(randomRollout)
+        self.prior = None           # NNPlayer whose Q values seed new nodes
+        self.priorWeight = 10.0
+        self.exploration = 1.4
+        self.pool = None
+
+        self.lastPlayouts = 0
+        self.lastTime = 0.0
+        self.totalPlayouts = 0
+        self.totalTime = 0.0
+
+    def setID(self, id):
+        self.id = id
+        return True
+
+    def setLimits(self, playouts, timeLimit):
+        """ sets the playouts and seconds per move, either may be None for
+        no limit but at least one is needed for a search to end """
+        if playouts is None and timeLimit is None:
+            raise ValueError("MCTSPlayer needs a playout or time limit")
+        self.playouts = playouts
+        self.timeLimit = timeLimit
+
+    def setRolloutPolicy(self, policy):
+        """ policy(board, player, rng) returns the pit index to play in
+        rollouts, rng being the search's random.Random. it must be a module
+        level function to run in a process pool. a policy that cannot take
+        the three arguments is refused here rather than in a worker """
+        args, varargs, keywords, defaults = inspect.getargspec(policy)
+        if varargs is None and len(args) < 3:
+            raise ValueError("a rollout policy is called as policy(board, player, rng), %s takes %s"
+                             % (policy.__name__, ", ".join(args)))
+        self.policy = policy
+
+    def setPrior(self, nnplayer, weight=10.0):
+        """ seed new nodes with the Q values of nnplayer, worth weight visits """
+        self.prior = nnplayer
+        self.priorWeight = weight
+
+    def setNumWorkers(self, numWorkers):
+        self.close()
+        self.numWorkers = numWorkers
+
+    def close(self):
+        """ shuts the process pool down """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def gameOver(self, myScore, oppScore):
+        """ does nothing """
+        pass
+
+    def getStats(self):
+        """ returns the playout statistics of the last move and all moves """
+        return {
+            'playouts': self.lastPlayouts,
+            'playoutsPerSecond': self.lastPlayouts / self.lastTime if self.lastTime > 0 else 0.0,
+            'totalPlayouts': self.totalPlayouts,
+            'totalPlayoutsPerSecond': self.totalPlayouts / self.totalTime if self.totalTime > 0 else 0.0,
+        }
+
+    def getMove(self, board):
+        """ returns the most visited move at the root """
+        moves = movesFromMask(board.legalMoves(self.id))
+        if len(moves) == 0:
+            return -1
+        if len(moves) == 1:
+            return moves[0] + 1
+
+        pits = board.getPits()
+        playouts = self.playouts
+        if playouts is not None:
+            playouts = max(1, playouts // self.numWorkers)
+        tasks = []
+        for i in range(self.numWorkers):
+            tasks.append((searchTree, pits, self.id, board.rowSize, board.stonePerPit, playouts,
+                          self.timeLimit, random.getrandbits(32), self.policy,
+                          self.prior, self.priorWeight, self.exploration))
+
+        start = time.time()
+        if self.numWorkers == 1:
+            results = [callTask(tasks[0])]
+        else:
+            if self.pool is None:
+                self.pool = Pool(self.numWorkers)
+            results = self.pool.map(callTask, tasks)
+
+        visits = {}
+        count = 0
+        for stats, played in results:
+            count += played
+            for move, (n, w) in stats.items():
+                visits[move] = visits.get(move, 0.0) + n
+
+        self.lastTime = time.time() - start
+        self.lastPlayouts = count
+        self.totalPlayouts += count
+        self.totalTime += self.lastTime
+        best = max(moves, key=lambda m: visits.get(m, 0.0))
+        return best + 1
+
+if __name__ == '__main__':
+    import runner
+    from player import AlphaBetaPlayer
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    player = MCTSPlayer(0, playouts=None, timeLimit=0.5, numWorkers=workers)
+    winner, plies = runner.playGame(player, AlphaBetaPlayer(1, 0.5))
+    player.close()
+    print "winner %d after %d plies" % (winner, plies)
+    print "%.0f playouts/s" % player.getStats()['totalPlayoutsPerSecond']
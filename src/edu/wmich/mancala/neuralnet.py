@@ -5,65 +5,159 @@ Created on Apr 23, 2010
 @author: changwang
 '''
 
-import math
+import numpy
+
+from checkpoint import writeCheckpoint, readCheckpoint
 
 DELTA = 0.1 # learning rate
 
 class NeuralNet(object):
     def __init__(self, input_size, hidden_size):
+        self.learningRate = DELTA
+        self.momentum = 0.0     # fraction of the last batch step carried over
+        self.version = 0        # bumped whenever the weights change
         self.setupNetwork(input_size, hidden_size)
     
+    def setLearningRate(self, rate):
+        """ set the step size used by learnFromExample and learnFromBatch """
+        if rate <= 0:
+            return False
+        self.learningRate = rate
+        return True
+    
+    def setMomentum(self, momentum):
+        """ set the momentum used by learnFromBatch, 0 disables it """
+        if momentum >= 1 or momentum < 0:
+            return False
+        self.momentum = momentum
+        return True
+    
     def setupNetwork(self, input_size, hidden_size):
         """ set up the network by the given input and hidden layer number """
+        self.version += 1
         self.inputSize = input_size
         self.hiddenSize = hidden_size
          
-        self.input = [0.0] * input_size # value of input node
-        self.input.append(1.0)   # bias for hidden layer
+        self.input = numpy.zeros(input_size + 1) # value of input node
+        self.input[-1] = 1.0    # bias for hidden layer
         
-        self.hidden = [0.0] * hidden_size   # value of hidden node
-        self.hidden.append(1.0)  # bias for output layer
-        self.weights = [0.0] * (hidden_size + 1)    # weight of hidden to output node
+        self.hidden = numpy.zeros(hidden_size + 1)  # value of hidden node
+        self.hidden[-1] = 1.0   # bias for output layer
+        self.weights = numpy.zeros(hidden_size + 1)    # weight of hidden to output node
         
-        self.hiddenWeights = {}   # two dimensional array, weight of input to hidden node
-        for i in range(input_size+1):
-            self.hiddenWeights[i] = [0.0] * (hidden_size + 1)
+        # weight of input to hidden node, row j holds the weights out of input j
+        self.hiddenWeights = numpy.zeros((input_size + 1, hidden_size + 1))
         
         self.output = 0.0   # value of output node
+        
+        # last batch step of each weight matrix, for momentum
+        self.weightsStep = numpy.zeros_like(self.weights)
+        self.hiddenWeightsStep = numpy.zeros_like(self.hiddenWeights)
     
     def calculate(self, example):
         """ Calculate the output of the given input """
-        self.input[:len(example)] = example[:]    # copy example input
+        self.input[:len(example)] = example    # copy example input
         
-        # calculate hidden layer
-        for i in range(self.hiddenSize):
-            self.hidden[i] = 0.0
-            for j in range(self.inputSize+1):
-                self.hidden[i] += self.input[j] * self.hiddenWeights[j][i]
-            self.hidden[i] = self.sigmoid(self.hidden[i])
+        # calculate hidden layer, the bias node keeps its value of 1
+        net = numpy.dot(self.input, self.hiddenWeights[:, :self.hiddenSize])
+        self.hidden[:self.hiddenSize] = self.sigmoid(net)
         
-        for i in range(self.hiddenSize+1):
-            self.output += self.hidden[i] * self.weights[i]
-            
+        self.output = float(numpy.dot(self.hidden, self.weights))
         return self.output
     
+    def calculateBatch(self, examples):
+        """ calculate the outputs of a matrix of inputs, one example per row,
+        in a single pass. returns an array with one output per row """
+        examples = numpy.asarray(examples, dtype=float)
+        width = examples.shape[1]
+        net = numpy.dot(examples, self.hiddenWeights[:width, :self.hiddenSize])
+        net += self.hiddenWeights[self.inputSize, :self.hiddenSize]   # bias
+        hidden = self.sigmoid(net)
+        return numpy.dot(hidden, self.weights[:self.hiddenSize]) + self.weights[self.hiddenSize]
+    
     def learnFromExample(self, example, desired):
         """ update weights to better approximate given example """
-        result = float(self.calculate(example))
+        result = self.calculate(example)
         err = float(desired) - result
-        for i in range(self.hiddenSize+1):
-            errN = float(err * self.weights[i] * (1 - self.hidden[i]) * self.hidden[i])
-            for j in range(self.inputSize+1):
-                self.hiddenWeights[j][i] += DELTA * errN * self.input[j]
+        errN = err * self.weights * (1 - self.hidden) * self.hidden
+        self.hiddenWeights += self.learningRate * numpy.outer(self.input, errN)
+        self.weights += self.learningRate * err * self.hidden
+        self.version += 1
+    
+    def newTraces(self):
+        """ returns zeroed eligibility traces, a pair of arrays shaped like
+        weights and hiddenWeights """
+        return (numpy.zeros(self.weights.shape), numpy.zeros(self.hiddenWeights.shape))
+    
+    def addTrace(self, traces, example, decay):
+        """ decays the traces by decay and adds the gradient of the output
+        for example to them, returns the output """
+        result = self.calculate(example)
+        traceWeights, traceHiddenWeights = traces
+        traceWeights *= decay
+        traceWeights += self.hidden
+        traceHiddenWeights *= decay
+        traceHiddenWeights += numpy.outer(self.input, self.weights * (1 - self.hidden) * self.hidden)
+        return result
+    
+    def learnFromTraces(self, traces, error):
+        """ moves every weight by error times its eligibility trace """
+        self.weights += self.learningRate * error * traces[0]
+        self.hiddenWeights += self.learningRate * error * traces[1]
+        self.version += 1
+    
+    def learnFromBatch(self, examples, targets):
+        """ update weights once with the gradient averaged over a batch of
+        examples, one per row. returns the mean squared error of the batch
+        before the update """
+        examples = numpy.asarray(examples, dtype=float)
+        targets = numpy.asarray(targets, dtype=float)
+        count, width = examples.shape
+        
+        # forward pass, keeping the bias input and bias hidden node
+        inputs = numpy.ones((count, self.inputSize + 1))
+        inputs[:, :self.inputSize] = 0.0
+        inputs[:, :width] = examples
+        hidden = numpy.ones((count, self.hiddenSize + 1))
+        hidden[:, :self.hiddenSize] = self.sigmoid(numpy.dot(inputs, self.hiddenWeights[:, :self.hiddenSize]))
+        err = targets - numpy.dot(hidden, self.weights)
+        
+        # backward pass, averaged over the batch
+        errN = err[:, None] * self.weights[:self.hiddenSize] * (1 - hidden[:, :self.hiddenSize]) * hidden[:, :self.hiddenSize]
+        rate = self.learningRate / count
+        self.hiddenWeightsStep *= self.momentum
+        self.hiddenWeightsStep[:, :self.hiddenSize] += rate * numpy.dot(inputs.T, errN)
+        self.weightsStep *= self.momentum
+        self.weightsStep += rate * numpy.dot(hidden.T, err)
         
-        for i in range(self.hiddenSize+1):
-            self.weights[i] += DELTA * err * self.hidden[i]
+        self.hiddenWeights += self.hiddenWeightsStep
+        self.weights += self.weightsStep
+        self.version += 1
+        return float(numpy.mean(err ** 2))
+    
+    def train(self, examples, targets, epochs=1, batchSize=32, report=False):
+        """ runs learnFromBatch over shuffled mini-batches for the given
+        number of epochs, returns the mean squared error of every epoch """
+        examples = numpy.asarray(examples, dtype=float)
+        targets = numpy.asarray(targets, dtype=float)
+        losses = []
+        for epoch in range(epochs):
+            order = numpy.random.permutation(len(examples))
+            total = 0.0
+            for start in range(0, len(order), batchSize):
+                batch = order[start:start+batchSize]
+                total += self.learnFromBatch(examples[batch], targets[batch]) * len(batch)
+            losses.append(total / max(1, len(order)))
+            if report:
+                print "epoch %d: loss %f" % (epoch + 1, losses[-1])
+        return losses
             
     def sigmoid(self, x):
-        """ non-linear function for hidden layer """
-        return float(1.0) / (1 + math.exp(-x))
+        """ non-linear function for hidden layer, works on arrays too """
+        # clipped so large activations saturate instead of overflowing
+        return 1.0 / (1.0 + numpy.exp(-numpy.clip(x, -500.0, 500.0)))
     
-    def saveToFile(self, filename, mode):
+    def saveToFile(self, filename, mode='w'):
         """ saves network weights to specified file """
         f = open(filename, mode)
         f.write(str(self.inputSize)+"\n")
@@ -71,8 +165,8 @@ class NeuralNet(object):
         for i in self.weights:
             f.write(str(i)+',')
         f.write("\n")
-        for key in iter(self.hiddenWeights):
-            for weight in self.hiddenWeights[key]:
+        for row in self.hiddenWeights:
+            for weight in row:
                 f.write(str(weight)+',')
             f.write('\n')
         f.flush()
@@ -85,30 +179,52 @@ class NeuralNet(object):
         hiSize = int(f.readline())
         self.setupNetwork(inSize, hiSize)
         wts = f.readline().split(',')
-        self.weights = [float(w) for w in wts[:-1]]
+        self.weights[:] = [float(w) for w in wts[:-1]]
         for i in range(self.inputSize+1):
             hwts = f.readline().split(',')
             self.hiddenWeights[i] = [float(hw) for hw in hwts[:-1]]
         f.close()
     
+    def saveCheckpoint(self, filename, settings=None):
+        """ saves network weights to a binary checkpoint, along with the
+        training settings and any extra settings given """
+        settings = dict(settings or {})
+        settings['learningRate'] = self.learningRate
+        settings['momentum'] = self.momentum
+        writeCheckpoint(filename, self.inputSize, self.hiddenSize,
+                        self.weights, self.hiddenWeights, settings)
+        
+    def loadCheckpoint(self, filename, mmap=True):
+        """ initialize the network from a binary checkpoint, returns the
+        settings stored with it. with mmap the weights are read-only views
+        of the file, so such a network can calculate but not learn """
+        data = readCheckpoint(filename, mmap)
+        self.setupNetwork(data['inputSize'], data['hiddenSize'])
+        self.weights = data['weights']
+        self.hiddenWeights = data['hiddenWeights']
+        settings = data['settings']
+        self.learningRate = settings.get('learningRate', self.learningRate)
+        self.momentum = settings.get('momentum', self.momentum)
+        return settings
+    
     def printNetwork(self):
         """ print network state """
         print "==================== beginning ========================="
         print
-        print self.input
+        print list(self.input)
         print
         print "=================== input to hidden ===================="
         print
-        for key in iter(self.hiddenWeights):
-            print self.hiddenWeights[key]
+        for row in self.hiddenWeights:
+            print list(row)
         print
         print "=================== hidden layer nodes ================="
         print
-        print self.hidden
+        print list(self.hidden)
         print
         print "================ hidden to output layer ================"
         print
-        print self.weights
+        print list(self.weights)
         print
         print "==================== output layer ======================"
         print
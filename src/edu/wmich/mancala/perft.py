@@ -0,0 +1,180 @@
+#coding:utf-8
+'''
+Created on Jun 18, 2010
+
+@author: changwang
+'''
+
+import sys
+import time
+from multiprocessing import Pool
+
+from mancala import MancalaBoard
+from arrayboard import ArrayMancalaBoard
+from player import movesFromMask
+from pooltask import callTask
+
+BACKENDS = [("pit", MancalaBoard), ("array", ArrayMancalaBoard)]
+
+# the fields of a count, summed over a tree
+FIELDS = ('leaves', 'terminals', 'wins0', 'wins1', 'ties', 'nodes')
+
+class PerftMismatch(Exception):
+    """ two backends counted a different tree """
+    pass
+
+def _perft(board, player, depth, cache):
+    """ counts the tree below the position, an extra turn is a ply of its
+    own. returns (leaves, terminals, wins0, wins1, ties, nodes): leaves
+    are the positions depth plies down plus the games over before that,
+    terminals those games split by result, nodes the positions visited
+    (the subtree of a cache hit is not visited) """
+    if board.isTerminal():
+        score = board.finalScore()
+        if score[0] > score[1]:
+            return (1, 1, 1, 0, 0, 1)
+        elif score[0] < score[1]:
+            return (1, 1, 0, 1, 0, 1)
+        return (1, 1, 0, 0, 1, 1)
+    if depth == 0:
+        return (1, 0, 0, 0, 0, 1)
+    if cache is not None:
+        key = str(bytearray(board.getPits() + [player, depth]))
+        found = cache.get(key)
+        if found is not None:
+            # the subtree was not walked again, only this node was visited
+            return found[:5] + (1,)
+
+    leaves = terminals = wins0 = wins1 = ties = 0
+    nodes = 1
+    for pitnum in movesFromMask(board.legalMoves(player)):
+        getsTurn, undo = board.makeMove(player, pitnum)
+        counts = _perft(board, player if getsTurn else (player+1)%2, depth - 1, cache)
+        board.unmakeMove(undo)
+        leaves += counts[0]
+        terminals += counts[1]
+        wins0 += counts[2]
+        wins1 += counts[3]
+        ties += counts[4]
+        nodes += counts[5]
+    counts = (leaves, terminals, wins0, wins1, ties, nodes)
+    if cache is not None:
+        cache[key] = counts
+    return counts
+
+def _newBoard(boardClass, pits, rowSize, stonePerPit):
+    board = boardClass(rowSize, stonePerPit)
+    if pits is not None:
+        board.setPits(pits)
+    return board
+
+def perft(boardClass, depth, pits=None, player=0, rowSize=6, stonePerPit=4, useCache=False):
+    """ counts the tree depth plies deep from pits (the start position if
+    None) with player to move, returns a dict of the FIELDS """
+    board = _newBoard(boardClass, pits, rowSize, stonePerPit)
+    cache = {} if useCache else None
+    return dict(zip(FIELDS, _perft(board, player, depth, cache)))
+
+def divide(boardClass, depth, pits=None, player=0, rowSize=6, stonePerPit=4, useCache=False):
+    """ the perft counts below every root move, {pitnum: counts dict} """
+    board = _newBoard(boardClass, pits, rowSize, stonePerPit)
+    cache = {} if useCache else None
+    results = {}
+    for pitnum in movesFromMask(board.legalMoves(player)):
+        getsTurn, undo = board.makeMove(player, pitnum)
+        counts = _perft(board, player if getsTurn else (player+1)%2, depth - 1, cache)
+        board.unmakeMove(undo)
+        results[pitnum] = dict(zip(FIELDS, counts))
+    return results
+
+def perftParallel(boardClass, depth, pits=None, player=0, rowSize=6, stonePerPit=4,
+                  useCache=False, numWorkers=None):
+    """ perft with the subtrees of the root moves counted in a pool of
+    processes, each with its own cache """
+    board = _newBoard(boardClass, pits, rowSize, stonePerPit)
+    if depth == 0 or board.isTerminal():
+        return perft(boardClass, depth, pits, player, rowSize, stonePerPit, useCache)
+    tasks = []
+    for pitnum in movesFromMask(board.legalMoves(player)):
+        getsTurn, undo = board.makeMove(player, pitnum)
+        tasks.append((perft, boardClass, depth - 1, board.getPits(), player if getsTurn else (player+1)%2,
+                      rowSize, stonePerPit, useCache))
+        board.unmakeMove(undo)
+
+    pool = Pool(numWorkers)
+    try:
+        parts = pool.map(callTask, tasks)
+    finally:
+        pool.close()
+        pool.join()
+    total = dict((field, sum(part[field] for part in parts)) for field in FIELDS)
+    total['nodes'] += 1     # the root
+    return total
+
+def findMismatch(depth, pits=None, player=0, rowSize=6, stonePerPit=4, backends=BACKENDS):
+    """ descends into the first root move the backends count differently
+    until the move whose result differs, returns None if they agree or a
+    description of the position and move """
+    path = []
+    while depth > 0:
+        divides = [divide(boardClass, depth, pits, player, rowSize, stonePerPit)
+                   for name, boardClass in backends]
+        if divides[0] == divides[1]:
+            return None
+        moves = sorted(set(divides[0]) | set(divides[1]))
+        bad = [m for m in moves if divides[0].get(m) != divides[1].get(m)][0]
+        path.append((player, bad))
+        boards = [_newBoard(boardClass, pits, rowSize, stonePerPit) for name, boardClass in backends]
+        results = [board.makeMove(player, bad)[0] for board in boards]
+        after = [board.getPits() for board in boards]
+        if results[0] != results[1] or after[0] != after[1] or depth == 1:
+            return "after moves %s player %d plays pit %d from %s:\n  %s gives %s, extra turn %s\n  %s gives %s, extra turn %s" % \
+                   (path[:-1], player, bad, pits, backends[0][0], after[0], results[0],
+                    backends[1][0], after[1], results[1])
+        pits = after[0]
+        player = player if results[0] else (player+1)%2
+        depth -= 1
+    return None
+
+def compare(depth, pits=None, player=0, rowSize=6, stonePerPit=4, useCache=False,
+            numWorkers=None, backends=BACKENDS, report=False):
+    """ runs perft on every backend and raises PerftMismatch if their
+    counts differ. returns {backend name: counts with seconds and nodes
+    per second} """
+    results = {}
+    for name, boardClass in backends:
+        start = time.time()
+        if numWorkers is not None and numWorkers > 1:
+            counts = perftParallel(boardClass, depth, pits, player, rowSize, stonePerPit, useCache, numWorkers)
+        else:
+            counts = perft(boardClass, depth, pits, player, rowSize, stonePerPit, useCache)
+        counts['seconds'] = time.time() - start
+        counts['nodesPerSecond'] = counts['nodes'] / counts['seconds'] if counts['seconds'] > 0 else 0.0
+        results[name] = counts
+        if report:
+            print "%-6s depth %d: %d leaves, %d terminal (%d/%d/%d), %d nodes in %.2fs, %.0f nodes/s" % \
+                  (name, depth, counts['leaves'], counts['terminals'], counts['wins0'], counts['wins1'],
+                   counts['ties'], counts['nodes'], counts['seconds'], counts['nodesPerSecond'])
+
+    reference = results[backends[0][0]]
+    for name, boardClass in backends[1:]:
+        # nodes differ with a cache, the counted tree must not
+        if any(results[name][field] != reference[field] for field in FIELDS[:-1]):
+            detail = findMismatch(depth, pits, player, rowSize, stonePerPit, [backends[0], (name, boardClass)])
+            raise PerftMismatch("%s and %s disagree at depth %d: %s vs %s\n%s" %
+                                (backends[0][0], name, depth, reference, results[name], detail))
+    return results
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print "usage: perft.py depth [workers] [cache]"
+        sys.exit(1)
+    depth = int(sys.argv[1])
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    useCache = len(sys.argv) > 3 and sys.argv[3] in ('1', 'cache', 'yes')
+    try:
+        for d in range(1, depth + 1):
+            compare(d, useCache=useCache, numWorkers=workers, report=True)
+    except PerftMismatch, e:
+        print >> sys.stderr, "MISMATCH: %s" % e
+        sys.exit(1)
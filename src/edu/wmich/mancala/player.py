@@ -6,26 +6,53 @@ Created on Apr 23, 2010
 import random
 import math
 import sys
+import time
+from array import array
 
+import numpy
+
+from arrayboard import ArrayMancalaBoard
 from neuralnet import NeuralNet
+from checkpoint import readLegacy, LEGACY_SETTINGS
+from poscache import QValueCache
+from replay import ReplayBuffer
+from encoder import StateEncoder
 
 PLAYER_TYPES = [
     "simple",
     "random",
     "neuralnet",
     "human",
+    "alphabeta",
+    "mcts",
 ]
 
+_maskMoves = {}
+
+def movesFromMask(mask):
+    """ returns the pit indices (from 0) set in a legal-move bitmask. the
+    lists are shared between calls, so do not change them """
+    moves = _maskMoves.get(mask)
+    if moves is None:
+        moves = [i for i in range(mask.bit_length()) if mask >> i & 1]
+        _maskMoves[mask] = moves
+    return moves
+
 class Pair(object):
-    """ struct to hold state, action, reward """
+    """ struct to hold state, action, reward. the state is kept as one
+    byte per count instead of a list of floats """
+    __slots__ = ('state', 'action', 'reward')
     
     def __init__(self, state, action, reward=0):
-        self.state = state
+        if isinstance(state, numpy.ndarray):
+            self.state = array('B', state.astype(numpy.uint8).tostring())
+        else:
+            self.state = array('B', [int(s) for s in state])
         self.action = action
         self.reward = reward
         
     def __repr__(self):
-        return "(a=" + self.action + ", r=" + self.reward + ", s=" + self.state + ")"
+        return "(a=" + str(self.action) + ", r=" + str(self.reward) + ", s=" + str(list(self.state)) + ")"
 
 class Player(object):
     """ this is a abstract class, defines the neccessary methods that
@@ -54,7 +81,7 @@ class NNPlayer(Player):
         'exponential'
     ]
     
-    def __init__(self, id, row=6, numStones=4):
+    def __init__(self, id, row=6, numStones=4, hiddenSize=None):
         self.setID(id)
         
         self.learn = True
@@ -66,14 +93,28 @@ class NNPlayer(Player):
         self.movelist = [[]] * 2  # two lists to allow for playing against self
         
         self.inputSize = 2+2*self.rowSize+1
-        self.Q = NeuralNet(self.inputSize, 2 * self.inputSize) # set the hidden layer 2 times the input layer
+        if hiddenSize is None:
+            hiddenSize = 2 * self.inputSize # set the hidden layer 2 times the input layer
+        self.Q = NeuralNet(self.inputSize, hiddenSize)
         # if exploit, choose expected optimal move
         # otherwise, explore (randomize choice)
         self.strategy = "greedy"
         
-        self.recentGames = []   # holds the transcripts of the most recent games
+        # transitions of the most recent games, numRecent of them are
+        # learned from again after every game
+        self.replay = ReplayBuffer(10000, self.inputSize - 1)
         self.numIterations = 1
         self.numRecent = 1      # number of games to track as recent
+        self.replayBatch = 0    # transitions sampled from the replay after every game
+        self.prioritized = False
+        
+        self.cache = QValueCache(4096)  # Q values of recently seen positions
+        self.encoder = StateEncoder(self.rowSize)
+        self.tablebase = None   # exact endgame moves, if one is given
+        
+        self.tdLambda = None    # trace decay of online TD(lambda) learning, None learns from transcripts
+        self.traces = None      # eligibility traces of the network weights
+        self.lastQ = None       # Q value of the last move, until its TD error is known
         
     def setID(self, id):
         """ set player identity """
@@ -92,6 +133,40 @@ class NNPlayer(Player):
         self.discount = discount
         return True
     
+    def setAlpha(self, alpha):
+        """ set the weight of a new Q value against the old one """
+        if alpha > 1 or alpha < 0:
+            return False
+        self.alpha = alpha
+        return True
+    
+    def setTDLambda(self, tdLambda):
+        """ learn online after every move with TD(lambda) and eligibility
+        traces decaying by discount * tdLambda, or from the transcript of
+        each game after it is over when tdLambda is None """
+        if tdLambda is not None and (tdLambda > 1 or tdLambda < 0):
+            return False
+        self.tdLambda = tdLambda
+        self.traces = None
+        self.lastQ = None
+        return True
+    
+    def setLearningRate(self, rate):
+        """ set the step size of the network updates """
+        return self.Q.setLearningRate(rate)
+    
+    def setTablebase(self, tablebase):
+        """ play endgames covered by the given Tablebase perfectly """
+        self.tablebase = tablebase
+    
+    def setCacheSize(self, size):
+        """ number of positions whose Q values are cached, 0 disables it """
+        self.cache.setCapacity(size)
+    
+    def getCacheStats(self):
+        """ returns hit-rate statistics of the Q value cache """
+        return self.cache.stats()
+    
     def setStrategy(self, strategy):
         """ if given strategy is supported return true """
         if strategy in NNPlayer.LEGAL_STRATEGY:
@@ -102,18 +177,24 @@ class NNPlayer(Player):
     def getMove(self, board):
         """ chooses next move """
         state = self._getState(board)
-        qVals = self._getQvals(board)
-        myside = board.mySide(self.id)
-        validMoves = [index for index, val in enumerate(myside) if val > 0]
+        qVals = self._getStateQvals(state)
+        validMoves = movesFromMask(board.legalMoves(self.id))
         
         # if there is no action available, just choose 0
         if len(validMoves) == 0: return -1
+        
+        if self.tablebase is not None:
+            found = self.tablebase.probe(board, self.id)
+            if found is not None and found[1] >= 0:
+                self._recordMove(state, qVals, found[1])
+                return found[1] + 1
+        
         # condense to only non-empty pits
         validQVals = []
         #for index, val in enumerate(validMoves):
 #            validQVals[index] = qVals[val]
         for val in validMoves:
-            validQVals.append(qVals[val - 1])
+            validQVals.append(qVals[val])
             
         # choose action based on strategy
         if self.strategy == NNPlayer.LEGAL_STRATEGY[0]: # greedy
@@ -128,12 +209,31 @@ class NNPlayer(Player):
             validMove = self._getBestIndex(validQVals)
         
         move = validMoves[validMove]
-        self.movelist[self.id].append(Pair(state, move))
-        return move
+        self._recordMove(state, qVals, move)
+        return move + 1
+    
+    def _recordMove(self, state, qVals, move):
+        """ keeps the move for learning, in TD(lambda) mode it is learned
+        from at once instead of being added to the move list """
+        if self.tdLambda is None:
+            self.movelist[self.id].append(Pair(state, move))
+        elif self.learn:
+            self._learnOnline(state, qVals, move)
+    
+    def _learnOnline(self, state, qVals, move):
+        """ one TD(lambda) step: the last move is corrected towards the best
+        Q value of this state, then this move joins the traces """
+        if self.lastQ is None:
+            self.traces = self.Q.newTraces()    # first move of a game
+        else:
+            self.Q.learnFromTraces(self.traces, self.alpha * (self.discount * max(qVals) - self.lastQ))
+        example = [float(move)]
+        example.extend(state[:self.inputSize-1])
+        self.lastQ = self.Q.addTrace(self.traces, example, self.discount * self.tdLambda)
         
     def _getRandIndex(self, validQvals):
         """ chooses a move randomly with uniform distribution """
-        return random.randint(len(validQvals))
+        return random.randrange(len(validQvals))
     
     def _getWeightedIndex(self, validQvals):
         """ chooses a move randomly based on predicted Q values """
@@ -202,109 +302,133 @@ class NNPlayer(Player):
     
     def _getQvals(self, board):
         """ retrieves the q values for all actions from the current state """
-        state = self._getState(board)
-        # create the input to neural network
-        toNN = [state[i-1] for i in range(1, self.inputSize)]
-        toNN.insert(0, 0.0)
-        # find expected rewards
-        qVals = []
-        for i in range(self.rowSize):
-            toNN[0] = float(i)
-            qVals.append(self.Q.calculate(toNN))
+        return self._getStateQvals(self._getState(board))
+    
+    def _getStateQvals(self, state):
+        """ retrieves the q values for all actions from the given state
+        with one batched pass through the network """
+        state = numpy.asarray(state, dtype=float)
+        if self.cache.capacity > 0:
+            key = state.tostring()
+            qVals = self.cache.lookup(key, self.Q.version)
+            if qVals is not None:
+                return list(qVals)
+        
+        # one row per action, the action goes in front of the state
+        qVals = self.Q.calculateBatch(self.encoder.actionRows(state)).tolist()
+        
+        if self.cache.capacity > 0:
+            self.cache.store(key, tuple(qVals), self.Q.version)
         return qVals
         
     def _getState(self, board):
-        """ constructs the state as a list """
-        mySide = board.mySide(self.id)
-        oppSide = board.oppSide(self.id)
-        myMancala = board.stonesInMyMancala(self.id)
-        oppMancala = board.stonesInOppMancala(self.id)
-        
-        state = [] # size should be inputSize - 1
-        state.append(float(myMancala))
-#        for i in range(self.rowSize):
-#            state.append(mySide[i])
-        for my in mySide:
-            state.append(float(my))
-        state.append(float(oppMancala))
-#        for i in range(self.rowSize):
-#            state.append(oppSide[i])
-        for op in oppSide:
-            state.append(float(op))
-        return state
+        """ returns the state from this player's point of view, own mancala
+        and row first. the array is the encoder's buffer, it is overwritten
+        by the next call """
+        return self.encoder.encodeState(board, self.id)
     
     def gameOver(self, myScore, oppScore):
         """ notifies learner that the game is over,
         update the Q function based on win or loss and the move list """
         if not self.learn:
+            self.movelist[self.id] = []
             return
         
         reward = float(myScore) - float(oppScore)
+        if self.tdLambda is not None:
+            if self.lastQ is not None:
+                self.Q.learnFromTraces(self.traces, self.alpha * (reward - self.lastQ))
+            self.lastQ = None
+            return
         self.movelist[self.id].append(reward)
         self._updateGameRecord(self.movelist[self.id])
         self.movelist[self.id] = []
         self._learnFromGameRecord()
         
     def _learnFromGameRecord(self):
-        for i in self.recentGames:
-            self._learnFromGame(self.recentGames[i])
-            
-    def _learnFromGame(self, movelist):
-        reward = float(movelist[-1])
-        # update Q function
-        sap = movelist[-2]
-        state = sap.state
-        action = sap.action
-        
-        example = []
-        example.append(float(action))
-        example.extend(state[:self.inputSize-1])
-        
-        oldQ = self.Q.calculate(example)
-        newQ = float((1.0 - self.alpha) * oldQ + self.alpha * reward)
-        self.Q.learnFromExample(example, newQ)
-        
-        nextState = state[:]
-        nextAction = action
-        nextExample = example[:]
-        
-        for i in range(3, len(movelist)):
-            sap = movelist[len(movelist)-i]
-            reward = sap.reward
-            state = sap.state
-            action = sap.action
-            
-            example = []
-            example.append(float(action))
-            example.extend(state[:self.inputSize-1])
-        
-            # find expected rewards
-            qVals = []
-            for i in range(self.rowSize):
-                nextExample[0] = float(i)
-                qVals[i] = self.Q.calculate(nextExample)
+        for episode in self.replay.lastEpisodes(self.numRecent):
+            self._learnFromEpisode(episode)
+        if self.replayBatch > 0 and len(self.replay) > 0:
+            self._learnFromReplay(self.replayBatch)
             
-            maxVal = max(qVals)
+    def _learnFromEpisode(self, indices):
+        """ updates the Q function from the last move of a game back to the
+        first, indices are the replay transitions of the game in order """
+        for i in reversed(indices):
+            example = [float(self.replay.actions[i])]
+            example.extend(self.replay.states[i])
+            if self.replay.terminals[i]:
+                target = self.replay.rewards[i]
+            else:
+                # find expected rewards of the state that followed
+                maxVal = max(self._getStateQvals(self.replay.nextStates[i]))
+                target = self.replay.rewards[i] + self.discount * maxVal
             oldQ = self.Q.calculate(example)
-            newQ = float((1.0 - self.alpha) * oldQ + self.alpha * (reward + self.discount * maxVal))
+            newQ = float((1.0 - self.alpha) * oldQ + self.alpha * target)
             self.Q.learnFromExample(example, newQ)
+    
+    def _learnFromReplay(self, batchSize):
+        """ one mini-batch update from transitions sampled out of the replay,
+        by priority if prioritized is set """
+        if self.prioritized:
+            indices, weights = self.replay.samplePrioritized(batchSize)
+        else:
+            indices, weights = self.replay.sample(batchSize), 1.0
+        states, actions, rewards, nextStates, terminals = self.replay.batch(indices)
+        examples = numpy.column_stack((actions, states)).astype(float)
+        oldQ = self.Q.calculateBatch(examples)
+        
+        # the best Q value of each next state, all its actions in one pass
+        count = len(indices)
+        toNN = numpy.empty((count * self.rowSize, self.inputSize))
+        toNN[:, 0] = numpy.tile(numpy.arange(self.rowSize), count)
+        toNN[:, 1:] = numpy.repeat(nextStates, self.rowSize, axis=0)
+        maxVals = self.Q.calculateBatch(toNN).reshape(count, self.rowSize).max(axis=1)
+        targets = rewards + self.discount * maxVals * ~terminals
+        
+        # the importance weights shrink the steps towards the target
+        step = self.alpha * (targets - oldQ)
+        self.Q.learnFromBatch(examples, oldQ + weights * step)
+        if self.prioritized:
+            self.replay.updatePriorities(indices, step)
             
     def _updateGameRecord(self, moves):
-        """ updates statistics """
-        while len(self.recentGames) > self.numRecent:
-            del self.recentGames[0]
-        self.recentGames.extend(moves)
+        """ adds the transitions of a finished game, its move list followed
+        by the final reward, to the replay """
+        if len(moves) < 2:   # the player never moved
+            return
+        reward = float(moves[-1])
+        pairs = moves[:-1]
+        for i, sap in enumerate(pairs):
+            if i + 1 < len(pairs):
+                self.replay.add(sap.state, sap.action, sap.reward, pairs[i+1].state, False)
+            else:
+                self.replay.add(sap.state, sap.action, reward, None, True)
         
     def setNumRecent(self, recent):
-        """ changes number of results to store as recent """
+        """ changes number of games learned from again after every game """
         self.numRecent = recent
+    
+    def setReplayCapacity(self, capacity):
+        """ number of transitions the replay keeps, the oldest go first """
+        if capacity < 1:
+            return False
+        self.replay.setCapacity(capacity)
+        return True
+    
+    def setReplayBatch(self, batchSize, prioritized=False):
+        """ after every game also learn from batchSize transitions sampled
+        from the replay, uniformly or by their last error. 0 turns it off """
+        self.replayBatch = batchSize
+        self.prioritized = prioritized
         
     def setNumIterations(self, iters):
         self.numIterations = iters
         
-    def saveToFile(self, filename, mode):
+    def saveToFile(self, filename, mode='w'):
+        """ saves the network and settings in the legacy text format """
         self.Q.saveToFile(filename, mode)
-        f = open(filename, mode)
+        f = open(filename, 'a')
         f.write(str(self.id)+"\n")
         f.write(str(self.rowSize)+"\n")
         f.write(str(self.stones)+"\n")
@@ -319,17 +443,98 @@ class NNPlayer(Player):
         f.close()
         
     def loadFromFile(self, filename):
+        """ loads the network and settings from the legacy text format """
         self.Q.loadFromFile(filename)
-        f = open(filename, 'r')
-        self.id = int(f.readline())
-        self.rowSize = int(f.readline())
-        self.stones = int(f.readline())
-        self.strategy = f.readline().trim()
-        self.learn = f.readline()
-        self.alpha = float(f.readline())
-        self.discount = float(f.readline())
-        self.numIterations = int(f.readline())
-        self.numRecent = int(f.readline())
+        self._setSettings(readLegacy(filename)['settings'])
+        
+    def saveCheckpoint(self, filename):
+        """ saves the network and settings as a binary checkpoint """
+        self.Q.saveCheckpoint(filename, self._getSettings())
+        
+    def loadCheckpoint(self, filename, shared=False):
+        """ loads a binary checkpoint. a shared player maps the weights
+        read-only from the file, so it stops learning """
+        self._setSettings(self.Q.loadCheckpoint(filename, mmap=shared))
+        if shared:
+            self.learn = False
+        
+    def getTrainingState(self):
+        """ copies everything further learning depends on, returns a dict of
+        numpy arrays and a dict of plain values. the copies stay valid
+        while the player goes on learning, so they can be written out in
+        the background. call it between games """
+        Q = self.Q
+        replay = self.replay
+        arrays = {
+            'weights': Q.weights.copy(),
+            'hiddenWeights': Q.hiddenWeights.copy(),
+            'weightsStep': Q.weightsStep.copy(),
+            'hiddenWeightsStep': Q.hiddenWeightsStep.copy(),
+            'replayStates': replay.states.copy(),
+            'replayActions': replay.actions.copy(),
+            'replayRewards': replay.rewards.copy(),
+            'replayNextStates': replay.nextStates.copy(),
+            'replayTerminals': replay.terminals.copy(),
+            'replayPriorities': replay.priorities.copy(),
+        }
+        settings = self._getSettings()
+        settings.update({
+            'hiddenSize': Q.hiddenSize,
+            'learningRate': Q.learningRate,
+            'momentum': Q.momentum,
+            'version': Q.version,
+            'replaySize': replay.size,
+            'replayPosition': replay.position,
+            'replayMaxPriority': replay.maxPriority,
+            'replayBatch': self.replayBatch,
+            'prioritized': self.prioritized,
+            'tdLambda': self.tdLambda,
+        })
+        return arrays, settings
+    
+    def setTrainingState(self, arrays, settings):
+        """ restores a state taken by getTrainingState """
+        self._setSettings(settings)
+        Q = self.Q
+        Q.setupNetwork(settings['inputSize'], settings['hiddenSize'])
+        Q.weights[:] = arrays['weights']
+        Q.hiddenWeights[:] = arrays['hiddenWeights']
+        Q.weightsStep[:] = arrays['weightsStep']
+        Q.hiddenWeightsStep[:] = arrays['hiddenWeightsStep']
+        Q.learningRate = settings['learningRate']
+        Q.momentum = settings['momentum']
+        Q.version = settings['version']
+        self.cache.clear()  # its entries may carry a restored version number
+        
+        states = arrays['replayStates']
+        self.replay = ReplayBuffer(len(states), states.shape[1], states.dtype)
+        self.replay.states[:] = states
+        self.replay.actions[:] = arrays['replayActions']
+        self.replay.rewards[:] = arrays['replayRewards']
+        self.replay.nextStates[:] = arrays['replayNextStates']
+        self.replay.terminals[:] = arrays['replayTerminals']
+        self.replay.priorities[:] = arrays['replayPriorities']
+        self.replay.size = settings['replaySize']
+        self.replay.position = settings['replayPosition']
+        self.replay.maxPriority = settings['replayMaxPriority']
+        
+        self.replayBatch = settings['replayBatch']
+        self.prioritized = settings['prioritized']
+        self.setTDLambda(settings['tdLambda'])
+        self.movelist = [[], []]
+        
+    def _getSettings(self):
+        """ returns the player settings stored with its weights """
+        settings = {}
+        for key, parse in LEGACY_SETTINGS:
+            settings[key] = getattr(self, key)
+        return settings
+    
+    def _setSettings(self, settings):
+        """ restores the player settings stored with its weights """
+        for key, parse in LEGACY_SETTINGS:
+            if key in settings:
+                setattr(self, key, settings[key])
         
 class RandomPlayer(Player):
     """ this player simply chooses a random pit to play after each move """
@@ -352,13 +557,11 @@ class RandomPlayer(Player):
     def getMove(self, board):
         """ will pseudo-randomly select the next pit to play """
         self.thisNumTurns += 1
-        moves = self._getAvailableActions(board)
-        return moves[random.randint(len(moves))]
+        return random.choice(movesFromMask(board.legalMoves(self.id))) + 1
     
     def _getAvailableActions(self, board):
-        """ returns a linked list of all actions that are legal for this state """
-        myPits = board.mySide(self.id)
-        return [i for i in myPits if i > 0]
+        """ returns a list of all actions that are legal for this state """
+        return [i + 1 for i in movesFromMask(board.legalMoves(self.id))]
             
 
 class SimplePlayer(Player):
@@ -378,14 +581,13 @@ class SimplePlayer(Player):
     
     def getMove(self, board):
         """ returns the closest pit to the manacla with stones in it. """
-        moves = self._getAvailableActions(board)
-        return moves[-1]
+        # the highest set bit is the non-empty pit nearest the mancala
+        return board.legalMoves(self.id).bit_length()
     
     def _getAvailableActions(self, board):
         """ returns a list of all actions that are legal
         for this state """
-        myPits = board.mySide(self.id)
-        return [i for i in myPits if i > 0]
+        return [i + 1 for i in movesFromMask(board.legalMoves(self.id))]
 
 class HumanPlayer(Player):
     def __init__(self, id):
@@ -413,3 +615,175 @@ class HumanPlayer(Player):
             print "Lost"
         else:
             print "Tie"
+
+class _SearchTimeout(Exception):
+    """ raised inside the search when the time budget runs out """
+    pass
+
+class AlphaBetaPlayer(Player):
+    """ searches the game tree with negamax alpha-beta. it deepens one ply
+    at a time until the time budget for the move runs out and plays the
+    best move of the deepest finished search. an extra turn keeps the same
+    player to move, so that child is searched without negating its value """
+    
+    def __init__(self, id, timeLimit=1.0, maxDepth=30):
+        self.setID(id)
+        self.timeLimit = timeLimit  # seconds per move
+        self.maxDepth = maxDepth
+        
+        self.board = None   # scratch board the search plays on
+        self.deadline = 0.0
+        self.nodes = 0
+        self.cutoff = False # true if the last search stopped at its depth
+        self.lastDepth = 0  # depth of the last finished search
+        self.lastNodes = 0
+        self.lastTime = 0.0
+        self.totalNodes = 0
+        self.totalTime = 0.0
+        self.tablebase = None
+        
+    def setID(self, id):
+        self.id = id
+        return True
+    
+    def setTablebase(self, tablebase):
+        """ use exact values from the given Tablebase in the search """
+        self.tablebase = tablebase
+    
+    def setTimeLimit(self, seconds):
+        """ set the wall-clock budget for each move """
+        if seconds <= 0:
+            return False
+        self.timeLimit = seconds
+        return True
+    
+    def gameOver(self, myScore, oppScore):
+        """ does nothing """
+        pass
+    
+    def getStats(self):
+        """ returns search statistics of the last move and all moves """
+        return {
+            'depth': self.lastDepth,
+            'nodes': self.lastNodes,
+            'nodesPerSecond': self.lastNodes / self.lastTime if self.lastTime > 0 else 0.0,
+            'totalNodes': self.totalNodes,
+            'totalNodesPerSecond': self.totalNodes / self.totalTime if self.totalTime > 0 else 0.0,
+        }
+    
+    def getMove(self, board):
+        """ returns the best move found within the time budget """
+        self.board = ArrayMancalaBoard(board.rowSize, board.stonePerPit)
+        self.board.setPits(board.getPits())
+        
+        start = time.time()
+        self.deadline = start + self.timeLimit
+        self.nodes = 0
+        moves = self._orderMoves(self.id)
+        if len(moves) == 0:
+            return -1
+        if self.tablebase is not None:
+            found = self.tablebase.probe(board, self.id)
+            if found is not None and found[1] >= 0:
+                return found[1] + 1
+        best = moves[0]
+        for depth in range(1, self.maxDepth + 1):
+            self.cutoff = False
+            try:
+                value, move = self._searchRoot(depth, moves)
+            except _SearchTimeout:
+                break
+            best = move
+            self.lastDepth = depth
+            # search the best move first on the next iteration
+            moves.remove(move)
+            moves.insert(0, move)
+            # a single move, or every line searched to the end of the game
+            if len(moves) == 1 or not self.cutoff:
+                break
+        
+        self.lastTime = time.time() - start
+        self.lastNodes = self.nodes
+        self.totalNodes += self.nodes
+        self.totalTime += self.lastTime
+        return best + 1
+    
+    def _searchRoot(self, depth, moves):
+        """ searches every root move to depth, returns (value, move) """
+        alpha = -sys.maxint
+        best = moves[0]
+        for move in moves:
+            value = self._searchMove(self.id, move, depth, alpha, sys.maxint)
+            if value > alpha:
+                alpha = value
+                best = move
+        return alpha, best
+    
+    def _searchMove(self, player, move, depth, alpha, beta):
+        """ plays move, searches the position after it and takes the move
+        back, returns its value for player """
+        getsTurn, undo = self.board.makeMove(player, move)
+        try:
+            if getsTurn:
+                return self._negamax(player, depth - 1, alpha, beta)
+            return -self._negamax((player+1)%2, depth - 1, -beta, -alpha)
+        finally:
+            self.board.unmakeMove(undo)
+    
+    def _negamax(self, player, depth, alpha, beta):
+        """ returns the value of the position for the player to move """
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.time() > self.deadline:
+            raise _SearchTimeout()
+        
+        pits = self.board.pits
+        n = self.board.rowSize
+        mine = player * (n + 1)
+        theirs = (n + 1) - mine
+        myStones = self.board.totals[player]
+        oppStones = self.board.totals[(player+1)%2]
+        score = pits[mine+n] - pits[theirs+n]
+        if myStones == 0 or oppStones == 0:
+            # the remaining stones go to their own side's mancala
+            return score + myStones - oppStones
+        if self.tablebase is not None and myStones + oppStones <= self.tablebase.maxStones:
+            found = self.tablebase.probePits(pits[:n] + pits[n+1:2*n+1], player)
+            return score + found[0]
+        if depth <= 0:
+            self.cutoff = True
+            return score
+        
+        for move in self._orderMoves(player):
+            value = self._searchMove(player, move, depth, alpha, beta)
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+        return alpha
+    
+    def _orderMoves(self, player):
+        """ returns the legal pits of player, extra-turn moves first, then
+        captures by size, then the rest from the mancala outwards """
+        pits = self.board.pits
+        n = self.board.rowSize
+        offset = player * (n + 1)
+        mancala = offset + n
+        across = self.board.across
+        extra = []
+        captures = []
+        rest = []
+        for pitnum in range(n - 1, -1, -1):
+            stones = pits[offset + pitnum]
+            if stones == 0:
+                continue
+            path = self.board.paths[player][pitnum]
+            last = path[(stones - 1) % len(path)]
+            if last == mancala:
+                extra.append(pitnum)
+            elif offset <= last < mancala and stones < len(path) and \
+                 pits[last] == 0 and pits[across[last]] > 0:
+                captures.append((pits[across[last]], pitnum))
+            else:
+                rest.append(pitnum)
+        captures.sort(reverse=True)
+        return extra + [pitnum for size, pitnum in captures] + rest
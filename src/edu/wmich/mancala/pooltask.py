@@ -0,0 +1,11 @@
+#coding:utf-8
+'''
+Created on May 7, 2010
+
+@author: changwang
+'''
+
+def callTask(task):
+    """ calls task[0] with the rest of task as arguments, so a function and
+    its arguments can go through Pool.map as one picklable tuple """
+    return task[0](*task[1:])
@@ -0,0 +1,74 @@
+#coding:utf-8
+'''
+Created on May 14, 2010
+
+@author: changwang
+'''
+
+from collections import OrderedDict
+
+class QValueCache(object):
+    """ a bounded map from a packed position to its Q values, evicting the
+    least recently used entry when full. every entry belongs to one version
+    of the network weights; a lookup with a newer version drops them all """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def setCapacity(self, capacity):
+        """ changes the number of positions kept, 0 disables the cache """
+        self.capacity = capacity
+        while len(self.entries) > max(0, capacity):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, key, version):
+        """ returns the cached Q values of key or None """
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+        values = self.entries.pop(key, None)
+        if values is None:
+            self.misses += 1
+            return None
+        self.entries[key] = values  # most recently used goes last
+        self.hits += 1
+        return values
+
+    def store(self, key, values, version):
+        """ remembers the Q values of key for this version of the weights """
+        if self.capacity <= 0 or version != self.version:
+            return
+        if key not in self.entries and len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = values
+
+    def clear(self):
+        """ drops every entry and resets the statistics """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def stats(self):
+        """ returns the cache statistics as a dict """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hitRate': float(self.hits) / lookups if lookups else 0.0,
+        }
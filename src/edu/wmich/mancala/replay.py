@@ -0,0 +1,125 @@
+#coding:utf-8
+'''
+Created on Jun 14, 2010
+
+@author: changwang
+'''
+
+import numpy
+
+class ReplayBuffer(object):
+    """ a fixed capacity store of (state, action, reward, nextState,
+    terminal) transitions in preallocated arrays. once full, every added
+    transition overwrites the oldest one, so memory use never changes.
+    a transition with terminal set ends an episode (a game) """
+
+    def __init__(self, capacity, stateSize, dtype=numpy.uint8):
+        self.stateSize = stateSize
+        self.dtype = dtype
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.states = numpy.zeros((capacity, self.stateSize), dtype=self.dtype)
+        self.actions = numpy.zeros(capacity, dtype=numpy.int16)
+        self.rewards = numpy.zeros(capacity)
+        self.nextStates = numpy.zeros((capacity, self.stateSize), dtype=self.dtype)
+        self.terminals = numpy.zeros(capacity, dtype=bool)
+        self.priorities = numpy.zeros(capacity)
+        self.size = 0
+        self.position = 0       # where the next transition goes
+        self.maxPriority = 1.0  # new transitions get the highest priority seen
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, nextState, terminal):
+        """ stores one transition, the next state of a terminal one is
+        not used and may be None """
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        if nextState is None:
+            self.nextStates[i] = 0
+        else:
+            self.nextStates[i] = nextState
+        self.terminals[i] = terminal
+        self.priorities[i] = self.maxPriority
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def clear(self):
+        self.size = 0
+        self.position = 0
+        self.maxPriority = 1.0
+
+    def setCapacity(self, capacity):
+        """ reallocates the arrays, keeping the newest transitions that fit.
+        capacity must be at least 1 """
+        order = self._chronological()[-capacity:]
+        old = (self.states[order], self.actions[order], self.rewards[order],
+               self.nextStates[order], self.terminals[order], self.priorities[order])
+        maxPriority = self.maxPriority
+        self._allocate(capacity)
+        count = len(order)
+        for array, values in zip((self.states, self.actions, self.rewards, self.nextStates,
+                                  self.terminals, self.priorities), old):
+            array[:count] = values
+        self.size = count
+        self.position = count % capacity
+        self.maxPriority = maxPriority
+
+    def _chronological(self):
+        """ indices of the stored transitions, oldest first """
+        return (self.position - self.size + numpy.arange(self.size)) % self.capacity
+
+    def sample(self, batchSize):
+        """ returns the indices of batchSize transitions drawn uniformly """
+        return numpy.random.randint(0, self.size, batchSize)
+
+    def samplePrioritized(self, batchSize, alpha=0.6, beta=0.4):
+        """ returns the indices of batchSize transitions drawn with
+        probability proportional to priority ** alpha, and the importance
+        weights correcting for it, scaled so the largest is 1 """
+        probabilities = self.priorities[:self.size] ** alpha
+        probabilities /= probabilities.sum()
+        indices = numpy.random.choice(self.size, batchSize, p=probabilities)
+        weights = (self.size * probabilities[indices]) ** -beta
+        return indices, weights / weights.max()
+
+    def updatePriorities(self, indices, errors, epsilon=1e-3):
+        """ sets the priorities of the given transitions from their errors """
+        priorities = numpy.abs(errors) + epsilon
+        self.priorities[indices] = priorities
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
+
+    def batch(self, indices):
+        """ returns (states, actions, rewards, nextStates, terminals) arrays
+        of the given transitions """
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.nextStates[indices], self.terminals[indices])
+
+    def lastEpisodes(self, count):
+        """ returns the indices of the newest count complete episodes, oldest
+        episode first and each in the order its transitions were added """
+        episodes = []
+        current = None
+        for back in range(self.size):
+            i = (self.position - 1 - back) % self.capacity
+            if self.terminals[i]:
+                if current is not None:
+                    current.reverse()
+                    episodes.append(current)
+                    if len(episodes) == count:
+                        break
+                current = [i]
+            elif current is not None:
+                current.append(i)
+        else:
+            # the oldest episode is only whole if nothing was overwritten yet
+            if current is not None and self.size < self.capacity and len(episodes) < count:
+                current.reverse()
+                episodes.append(current)
+        episodes.reverse()
+        return episodes
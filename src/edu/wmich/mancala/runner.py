@@ -0,0 +1,129 @@
+#coding:utf-8
+'''
+Created on May 7, 2010
+
+@author: changwang
+'''
+
+import random
+import sys
+from multiprocessing import Pool, cpu_count
+
+import numpy
+
+from mancala import MancalaBoard
+from agent import PlayerAgent
+from player import PLAYER_TYPES
+from pooltask import callTask
+
+def playGame(player0, player1, board=None, recorder=None):
+    """ plays one game between the two players without printing anything,
+    notifies both players of the result and returns (winner, plies). every
+    move and the result go to recorder, a GameRecordWriter, if given """
+    if board is None:
+        board = MancalaBoard()
+    players = [player0, player1]
+
+    id = 0
+    plies = 0
+    while not board.isGameOver():
+        move = players[id].getMove(board)
+        if move < 1 or move > board.rowSize or board.mySide(id)[move-1] == 0:
+            raise ValueError("player %d made an illegal move: %s" % (id, move))
+        if recorder is not None:
+            recorder.addPosition(board, id, move - 1)
+        if not board.playPit(id, move - 1):
+            id = (id+1)%2
+        plies += 1
+
+    if recorder is not None:
+        recorder.endGame(board)
+    scores = [board.stonesInMyMancala(0), board.stonesInMyMancala(1)]
+    player0.gameOver(scores[0], scores[1])
+    player1.gameOver(scores[1], scores[0])
+    return board.winner(), plies
+
+def playGames(type0, type1, numGames, seed=None, boardClass=MancalaBoard):
+    """ plays numGames games between two freshly created players, returns
+    the counts from player 0's point of view """
+    random.seed(seed)
+    numpy.random.seed(seed)
+    player0 = PlayerAgent(type0, 0).createPlayer()
+    player1 = PlayerAgent(type1, 1).createPlayer()
+
+    results = {'games': 0, 'wins': 0, 'losses': 0, 'ties': 0, 'plies': 0}
+    for i in range(numGames):
+        winner, plies = playGame(player0, player1, boardClass())
+        if winner == 0:
+            results['wins'] += 1
+        elif winner == 1:
+            results['losses'] += 1
+        else:
+            results['ties'] += 1
+        results['games'] += 1
+        results['plies'] += plies
+    return results
+
+def runMatch(type0, type1, numGames, numWorkers=None, seeds=None, boardClass=MancalaBoard):
+    """ plays numGames games between player types type0 and type1 split
+    across a pool of numWorkers processes. worker i is seeded with seeds[i],
+    or i when no seeds are given. returns win/loss/tie counts for player 0
+    and the average game length in plies """
+    if numWorkers is None:
+        numWorkers = cpu_count()
+    numWorkers = max(1, min(numWorkers, numGames))
+    if seeds is None:
+        seeds = range(numWorkers)
+
+    tasks = []
+    for i in range(numWorkers):
+        games = numGames // numWorkers + (1 if i < numGames % numWorkers else 0)
+        tasks.append((playGames, type0, type1, games, seeds[i], boardClass))
+
+    if numWorkers == 1:
+        parts = [callTask(tasks[0])]
+    else:
+        pool = Pool(numWorkers)
+        try:
+            parts = pool.map(callTask, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    results = {'games': 0, 'wins': 0, 'losses': 0, 'ties': 0, 'plies': 0}
+    for part in parts:
+        for key in results:
+            results[key] += part[key]
+    results['averageLength'] = float(results['plies']) / max(1, results['games'])
+    return results
+
+def smokeTest(numGames=1, seed=0):
+    """ plays numGames games of every player type but human against a random
+    player, from both sides, in this process. returns {(type0, type1):
+    results}, a player that cannot finish a game raises """
+    results = {}
+    for type in PLAYER_TYPES:
+        if type == "human":
+            continue
+        for type0, type1 in [(type, "random"), ("random", type)]:
+            results[(type0, type1)] = playGames(type0, type1, numGames, seed)
+    return results
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ["smoke"]:
+        for (type0, type1), results in sorted(smokeTest().items()):
+            print "%s vs %s: wins %d, losses %d, ties %d" % \
+                  (type0, type1, results['wins'], results['losses'], results['ties'])
+        sys.exit(0)
+    if len(sys.argv) < 4:
+        print "usage: runner.py type0 type1 games [workers] [seed] | runner.py smoke"
+        sys.exit(1)
+    type0, type1, games = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+
+    numWorkers = workers or cpu_count()
+    results = runMatch(type0, type1, games, workers, range(seed, seed + numWorkers))
+    print "%s vs %s: %d games" % (type0, type1, results['games'])
+    print "wins %d, losses %d, ties %d" % (results['wins'], results['losses'], results['ties'])
+    print "average game length %.1f plies" % results['averageLength']
@@ -0,0 +1,518 @@
+#coding:utf-8
+'''
+Created on Jun 8, 2010
+
+@author: changwang
+'''
+
+import asynchat
+import asyncore
+import collections
+import errno
+import json
+import Queue
+import random
+import socket
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+import numpy
+
+from mancala import MancalaBoard
+from agent import PlayerAgent
+from player import NNPlayer, movesFromMask
+
+# the only player types a client may play against, anything that waits for
+# input (a human) would stall every session on the event loop
+SERVER_TYPES = ("random", "simple", "nn", "neuralnet", "alphabeta", "mcts")
+
+# player types whose moves are searched in the thread pool, the others are
+# cheap enough to be played on the event loop
+POOLED_TYPES = ("nn", "neural", "alphabeta", "mcts")
+
+MAX_LINE = 1024         # longest command line a client may send
+LATENCY_SAMPLES = 10000 # server move latencies kept for the percentiles
+
+# the protocol, one command or reply per line:
+#   client: NEW type [first|second]   starts a game against a server player,
+#                                     type is one of SERVER_TYPES
+#           MOVE pit                  plays pit 1 to rowSize on the client's turn
+#           STATS                     asks for the server metrics
+#           QUIT                      closes the connection
+#   server: GAME side                 the client plays side 0 or 1
+#           BOARD toMove c0 ... c13   every count in board order after a move,
+#                                     toMove is -1 once the game is over
+#           MOVED pit                 the server player played pit
+#           OVER winner score0 score1 [forfeit]   winner is -1 for a tie
+#           STATS {json}
+#           ERR message
+#           BYE
+
+class _Waker(asyncore.dispatcher):
+    """ lets pool threads hand their results to the event loop: a result is
+    queued and a byte written to a socket pair the loop is watching """
+
+    def __init__(self, map):
+        reader, self.writer = socket.socketpair()
+        self.writer.setblocking(0)
+        asyncore.dispatcher.__init__(self, reader, map)
+        self.pending = Queue.Queue()
+
+    def call(self, function, *args):
+        """ runs function(*args) on the event loop, safe from any thread """
+        self.pending.put((function, args))
+        try:
+            self.writer.send('x')
+        except socket.error, e:
+            # a full pipe already wakes the loop up
+            if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            self.recv(4096)
+        except socket.error:
+            pass
+        while True:
+            try:
+                function, args = self.pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                function(*args)
+            except Exception:
+                self.handle_error()
+
+    def handle_error(self):
+        # report a failing result but keep the waker, the loop needs it
+        nil, t, v, tbinfo = asyncore.compact_traceback()
+        print >> sys.stderr, "server: uncaptured error %s:%s %s" % (t, v, tbinfo)
+
+    def close(self):
+        asyncore.dispatcher.close(self)
+        self.writer.close()
+
+class ServerStats(object):
+    """ counters and move latencies of a running server """
+
+    def __init__(self):
+        self.start = time.time()
+        self.connections = 0
+        self.sessionsStarted = 0
+        self.sessionsFinished = 0
+        self.forfeits = 0
+        self.moveTimeouts = 0
+        self.serverMoves = 0
+        self.clientMoves = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self, activeSessions, openConnections):
+        uptime = time.time() - self.start
+        result = {
+            'uptime': uptime,
+            'connections': self.connections,
+            'openConnections': openConnections,
+            'activeSessions': activeSessions,
+            'sessionsStarted': self.sessionsStarted,
+            'sessionsFinished': self.sessionsFinished,
+            'sessionsPerSecond': self.sessionsFinished / uptime if uptime > 0 else 0.0,
+            'forfeits': self.forfeits,
+            'moveTimeouts': self.moveTimeouts,
+            'serverMoves': self.serverMoves,
+            'clientMoves': self.clientMoves,
+        }
+        if self.latencies:
+            samples = numpy.array(self.latencies) * 1000.0
+            for p in (50, 90, 99):
+                result['moveLatencyMsP%d' % p] = float(numpy.percentile(samples, p))
+            result['moveLatencyMsMax'] = float(samples.max())
+        return result
+
+class Session(object):
+    """ one game between a client and a server player """
+
+    def __init__(self, connection, opponent, player, clientSide, board):
+        self.connection = connection
+        self.opponent = opponent        # server player type
+        self.player = player
+        self.clientSide = clientSide
+        self.board = board
+        self.toMove = 0
+        self.plies = 0
+        self.deadline = None    # when the side to move runs out of time
+        self.searching = None   # token of the pool search in flight
+        self.searchStart = 0.0
+        self.finished = False
+
+    def serverSide(self):
+        return (self.clientSide+1)%2
+
+class Connection(asynchat.async_chat):
+    """ a client connection, playing one game at a time """
+
+    def __init__(self, sock, server):
+        asynchat.async_chat.__init__(self, sock, server.map)
+        self.set_terminator('\n')
+        self.server = server
+        self.buffer = []
+        self.length = 0
+        self.session = None
+
+    def collect_incoming_data(self, data):
+        self.length += len(data)
+        if self.length > MAX_LINE:
+            self.sendLine("ERR line too long")
+            self.close_when_done()
+            return
+        self.buffer.append(data)
+
+    def found_terminator(self):
+        line = ''.join(self.buffer).strip()
+        self.buffer = []
+        self.length = 0
+        words = line.split()
+        if not words:
+            return
+        command = words[0].upper()
+        if command == 'NEW':
+            self.server.newSession(self, words[1:])
+        elif command == 'MOVE':
+            self.server.clientMove(self, words[1:])
+        elif command == 'STATS':
+            self.sendLine("STATS " + json.dumps(self.server.getStats(), sort_keys=True))
+        elif command == 'QUIT':
+            self.sendLine("BYE")
+            self.close_when_done()
+        else:
+            self.sendLine("ERR unknown command %s" % words[0][:32])
+
+    def sendLine(self, line):
+        self.push(line + '\n')
+
+    def handle_close(self):
+        self.server.dropConnection(self)
+        self.close()
+
+    def handle_error(self):
+        self.server.dropConnection(self)
+        asynchat.async_chat.handle_error(self)
+
+class MatchServer(asyncore.dispatcher):
+    """ hosts many games at once on one event loop. cheap server players
+    move on the loop itself, expensive ones (see POOLED_TYPES) search in a
+    thread pool so the loop keeps serving the other games meanwhile.
+    a server move that takes longer than moveTimeout is replaced by a
+    random legal move, a client that takes longer than clientTimeout
+    forfeits the game """
+
+    def __init__(self, host='localhost', port=7010, numThreads=4, moveTimeout=5.0,
+                 clientTimeout=60.0, boardClass=MancalaBoard, checkpoint=None):
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(1024)
+        self.address = self.socket.getsockname()
+
+        self.moveTimeout = moveTimeout
+        self.clientTimeout = clientTimeout
+        self.boardClass = boardClass
+        self.checkpoint = checkpoint    # NNPlayer weights, memory mapped by every session
+        self.pool = ThreadPool(numThreads)
+        self.waker = _Waker(self.map)
+        self.sessions = set()
+        self.connections = set()
+        self.stats = ServerStats()
+        self.nextToken = 0
+
+    def createPlayer(self, type, id):
+        """ a fresh server player that does not learn from its games """
+        player = PlayerAgent(type, id).createPlayer()
+        if isinstance(player, NNPlayer):
+            if self.checkpoint is not None:
+                player.loadCheckpoint(self.checkpoint, shared=True)
+                # the checkpoint restores the id it was saved with
+                player.setID(id)
+            player.setLearning(False)
+        return player
+
+    def getStats(self):
+        return self.stats.snapshot(len(self.sessions), len(self.connections))
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None:
+            return
+        self.connections.add(Connection(pair[0], self))
+        self.stats.connections += 1
+
+    def dropConnection(self, connection):
+        self.connections.discard(connection)
+        if connection.session is not None:
+            self._endSession(connection.session)
+
+    def newSession(self, connection, args):
+        if connection.session is not None:
+            connection.sendLine("ERR a game is in progress")
+            return
+        if not args:
+            connection.sendLine("ERR usage: NEW type [first|second]")
+            return
+        opponent = args[0].lower()
+        if opponent not in SERVER_TYPES:
+            connection.sendLine("ERR unknown opponent %s" % opponent)
+            return
+        order = args[1].lower() if len(args) > 1 else 'first'
+        if order not in ('first', 'second'):
+            connection.sendLine("ERR usage: NEW type [first|second]")
+            return
+        clientSide = 0 if order == 'first' else 1
+        player = self.createPlayer(opponent, (clientSide+1)%2)
+        session = Session(connection, opponent, player, clientSide, self.boardClass())
+        connection.session = session
+        self.sessions.add(session)
+        self.stats.sessionsStarted += 1
+        connection.sendLine("GAME %d" % clientSide)
+        self._sendBoard(session)
+        self._advance(session)
+
+    def clientMove(self, connection, args):
+        session = connection.session
+        if session is None:
+            connection.sendLine("ERR no game in progress")
+            return
+        if session.toMove != session.clientSide:
+            connection.sendLine("ERR not your turn")
+            return
+        try:
+            move = int(args[0])
+        except (IndexError, ValueError):
+            connection.sendLine("ERR usage: MOVE pit")
+            return
+        if move < 1 or move > session.board.rowSize or \
+           not session.board.legalMoves(session.clientSide) >> (move-1) & 1:
+            connection.sendLine("ERR illegal move %d" % move)
+            return
+        self.stats.clientMoves += 1
+        self._play(session, move)
+        self._advance(session)
+
+    def _play(self, session, move):
+        """ plays move for the side to move and tells the client """
+        session.deadline = None
+        if not session.board.playPit(session.toMove, move - 1):
+            session.toMove = (session.toMove+1)%2
+        session.plies += 1
+        self._sendBoard(session)
+
+    def _sendBoard(self, session):
+        # isGameOver also sweeps the remaining stones into the mancalas
+        toMove = -1 if session.board.isGameOver() else session.toMove
+        session.connection.sendLine("BOARD %d %s" % (toMove,
+                                    ' '.join(str(c) for c in session.board.getPits())))
+
+    def _advance(self, session):
+        """ plays server moves until it is the client's turn, a search is
+        running in the pool or the game is over """
+        while not session.finished:
+            if session.board.isGameOver():
+                self._finish(session)
+                return
+            if session.toMove == session.clientSide:
+                session.deadline = time.time() + self.clientTimeout
+                return
+            if session.opponent.startswith(POOLED_TYPES):
+                self._submit(session)
+                return
+            start = time.time()
+            move = session.player.getMove(session.board)
+            self._serverMove(session, move, start)
+
+    def _submit(self, session):
+        """ searches the server move in the pool on a copy of the board, so a
+        search that is given up on never sees the board change under it """
+        self.nextToken += 1
+        session.searching = self.nextToken
+        session.searchStart = time.time()
+        session.deadline = session.searchStart + self.moveTimeout
+        board = self.boardClass(session.board.rowSize, session.board.stonePerPit)
+        board.setPits(session.board.getPits())
+        self.pool.apply_async(self._search, (session, session.searching, session.player, board))
+
+    def _search(self, session, token, player, board):
+        """ runs in a pool thread """
+        try:
+            move = player.getMove(board)
+        except Exception:
+            move = -1
+        self.waker.call(self._searched, session, token, move)
+
+    def _searched(self, session, token, move):
+        if session.finished or session.searching != token:
+            return  # timed out or abandoned meanwhile
+        session.searching = None
+        self._serverMove(session, move, session.searchStart)
+        self._advance(session)
+
+    def _serverMove(self, session, move, start):
+        legal = movesFromMask(session.board.legalMoves(session.toMove))
+        if move - 1 not in legal:
+            move = random.choice(legal) + 1
+        self.stats.serverMoves += 1
+        self.stats.latencies.append(time.time() - start)
+        session.connection.sendLine("MOVED %d" % move)
+        self._play(session, move)
+
+    def _finish(self, session, forfeit=False):
+        board = session.board
+        if forfeit:
+            winner = session.serverSide()
+        else:
+            winner = board.winner()
+        line = "OVER %d %d %d" % (winner, board.stonesInMyMancala(0), board.stonesInMyMancala(1))
+        if forfeit:
+            line += " forfeit"
+            self.stats.forfeits += 1
+        session.connection.sendLine(line)
+        self.stats.sessionsFinished += 1
+        self._endSession(session)
+
+    def _endSession(self, session):
+        session.finished = True
+        session.searching = None
+        session.deadline = None
+        self.sessions.discard(session)
+        if session.connection.session is session:
+            session.connection.session = None
+
+    def checkTimeouts(self):
+        """ plays a random move for a server player past its deadline and
+        ends the game of a client past its deadline """
+        now = time.time()
+        for session in list(self.sessions):
+            if session.deadline is None or now < session.deadline:
+                continue
+            if session.toMove == session.clientSide:
+                self._finish(session, forfeit=True)
+                continue
+            # the late search keeps the old player, the session gets a new one
+            self.stats.moveTimeouts += 1
+            session.searching = None
+            session.player = self.createPlayer(session.opponent, session.serverSide())
+            self._serverMove(session, -1, session.searchStart)
+            self._advance(session)
+
+    def serve(self, duration=None):
+        """ runs the event loop for duration seconds, or until closed """
+        end = time.time() + duration if duration is not None else None
+        while self.map and (end is None or time.time() < end):
+            asyncore.loop(timeout=0.05, use_poll=True, map=self.map, count=1)
+            self.checkTimeouts()
+
+    def close(self):
+        for connection in list(self.connections):
+            connection.close()
+        self.connections.clear()
+        self.sessions.clear()
+        self.waker.close()
+        asyncore.dispatcher.close(self)
+        self.pool.close()
+        self.pool.join()
+
+class LoadClient(asynchat.async_chat):
+    """ a test client that plays random legal moves for a number of games """
+
+    def __init__(self, address, opponent, games, results, map):
+        asynchat.async_chat.__init__(self, map=map)
+        self.set_terminator('\n')
+        self.opponent = opponent
+        self.games = games
+        self.results = results
+        self.buffer = []
+        self.side = 0
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.connect(address)
+
+    def handle_connect(self):
+        self._newGame()
+
+    def _newGame(self):
+        order = random.choice(['first', 'second'])
+        self.push("NEW %s %s\n" % (self.opponent, order))
+
+    def collect_incoming_data(self, data):
+        self.buffer.append(data)
+
+    def found_terminator(self):
+        words = ''.join(self.buffer).split()
+        self.buffer = []
+        if not words:
+            return
+        if words[0] == 'GAME':
+            self.side = int(words[1])
+        elif words[0] == 'BOARD':
+            counts = [int(c) for c in words[2:]]
+            if int(words[1]) == self.side:
+                n = len(counts) // 2 - 1
+                start = self.side * (n + 1)
+                moves = [i for i in range(n) if counts[start + i] > 0]
+                if moves:
+                    self.push("MOVE %d\n" % (random.choice(moves) + 1))
+        elif words[0] == 'OVER':
+            self.results['games'] += 1
+            self.games -= 1
+            if self.games > 0:
+                self._newGame()
+            else:
+                self.push("QUIT\n")
+        elif words[0] == 'ERR':
+            self.results['errors'] += 1
+        elif words[0] == 'BYE':
+            self.close()
+
+    def handle_error(self):
+        self.results['errors'] += 1
+        self.close()
+
+def loadTest(host, port, numClients, gamesPerClient, opponent='simple'):
+    """ plays gamesPerClient games on each of numClients connections at
+    once against a running server, returns games per second """
+    map = {}
+    results = {'games': 0, 'errors': 0}
+    for i in range(numClients):
+        LoadClient((host, port), opponent, gamesPerClient, results, map)
+    start = time.time()
+    asyncore.loop(timeout=0.05, use_poll=True, map=map)
+    elapsed = time.time() - start
+    results['seconds'] = elapsed
+    results['gamesPerSecond'] = results['games'] / elapsed if elapsed > 0 else 0.0
+    return results
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ('serve', 'load'):
+        print "usage: server.py serve port [threads] [moveTimeout] [checkpoint]"
+        print "       server.py load port clients games [type]"
+        sys.exit(1)
+    port = int(sys.argv[2])
+    if sys.argv[1] == 'serve':
+        threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+        moveTimeout = float(sys.argv[4]) if len(sys.argv) > 4 else 5.0
+        checkpoint = sys.argv[5] if len(sys.argv) > 5 else None
+        server = MatchServer('', port, threads, moveTimeout, checkpoint=checkpoint)
+        print "serving on port %d" % server.address[1]
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            print json.dumps(server.getStats(), indent=2, sort_keys=True)
+            server.close()
+    else:
+        clients, games = int(sys.argv[3]), int(sys.argv[4])
+        opponent = sys.argv[5] if len(sys.argv) > 5 else 'simple'
+        results = loadTest('localhost', port, clients, games, opponent)
+        print "%d games on %d connections in %.2fs (%.1f games/s), %d errors" % \
+              (results['games'], clients, results['seconds'], results['gamesPerSecond'], results['errors'])
@@ -0,0 +1,221 @@
+#coding:utf-8
+'''
+Created on Jun 10, 2010
+
+@author: changwang
+'''
+
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+
+import numpy
+
+from arrayboard import ArrayMancalaBoard
+from player import NNPlayer, SimplePlayer, RandomPlayer
+from pooltask import callTask
+import runner
+
+# the default search space, a list is a set of choices and a (low, high)
+# tuple a range to draw from in a random search
+SPACE = {
+    'learningRate': [0.01, 0.05, 0.1, 0.3],
+    'alpha': [0.1, 0.3, 0.5, 0.7],
+    'discount': [0.8, 0.9, 0.95, 1.0],
+    'hiddenSize': [15, 30, 60],
+    'strategy': list(NNPlayer.LEGAL_STRATEGY),
+}
+
+OPPONENTS = [("simple", SimplePlayer), ("random", RandomPlayer)]
+
+def gridSearch(space):
+    """ returns every combination of the choices in space """
+    keys = sorted(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*[space[k] for k in keys])]
+
+def randomSearch(space, count, seed=0):
+    """ returns count configurations drawn from space """
+    rand = random.Random(seed)
+    configs = []
+    for i in range(count):
+        config = {}
+        for key in sorted(space):
+            values = space[key]
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[key] = rand.randint(low, high)
+                else:
+                    config[key] = rand.uniform(low, high)
+            else:
+                config[key] = rand.choice(values)
+        configs.append(config)
+    return configs
+
+def configKey(config):
+    """ the string a configuration is known by in the results file """
+    return json.dumps(config, sort_keys=True)
+
+def _runKey(key, trainGames, evalGames, seed):
+    """ what a result is known by when resuming, the same configuration
+    trained or scored for a different number of games is another run """
+    return (key, trainGames, evalGames, seed)
+
+def createPlayer(config, id):
+    """ a fresh NNPlayer with the settings of config """
+    player = NNPlayer(id, hiddenSize=config['hiddenSize'])
+    player.setAlpha(config['alpha'])
+    player.setDiscountFactor(config['discount'])
+    player.setLearningRate(config['learningRate'])
+    player.setStrategy(config['strategy'])
+    return player
+
+def evaluate(player, opponentClass, games):
+    """ plays games greedy games against opponentClass, half of them from
+    each side, and returns the fraction of points won, a tie is half """
+    points = 0.0
+    for g in range(games):
+        id = g % 2
+        player.setID(id)
+        opponent = opponentClass((id+1)%2)
+        if id == 0:
+            winner, plies = runner.playGame(player, opponent, ArrayMancalaBoard())
+        else:
+            winner, plies = runner.playGame(opponent, player, ArrayMancalaBoard())
+        if winner == id:
+            points += 1.0
+        elif winner == -1:
+            points += 0.5
+    return points / games
+
+def trainAndScore(config, trainGames, evalGames, seed):
+    """ trains one network with config by self-play, both sides learning
+    into the same network, then scores it against every opponent """
+    random.seed(seed)
+    numpy.random.seed(seed)
+    player0 = createPlayer(config, 0)
+    player1 = createPlayer(config, 1)
+    player1.Q = player0.Q
+
+    start = time.time()
+    for g in range(trainGames):
+        runner.playGame(player0, player1, ArrayMancalaBoard())
+    trainTime = time.time() - start
+
+    player0.setLearning(False)
+    player0.setStrategy('greedy')
+    scores = {}
+    for name, opponentClass in OPPONENTS:
+        scores[name] = evaluate(player0, opponentClass, evalGames)
+    return {
+        'key': configKey(config),
+        'config': config,
+        'seed': seed,
+        'trainGames': trainGames,
+        'evalGames': evalGames,
+        'trainSeconds': trainTime,
+        'scores': scores,
+        'score': sum(scores.values()) / len(scores),
+    }
+
+def readResults(filename):
+    """ returns the results already in filename, a line cut off by an
+    interrupted sweep is skipped """
+    results = []
+    if not os.path.exists(filename):
+        return results
+    f = open(filename, 'r')
+    for line in f:
+        try:
+            results.append(json.loads(line))
+        except ValueError:
+            pass
+    f.close()
+    return results
+
+def runSweep(configs, filename, trainGames=200, evalGames=50, numWorkers=None, seed=0):
+    """ trains and scores every configuration not yet in filename, one per
+    process, appending each result to filename as soon as it is known.
+    configuration i is seeded with seed + i, so a resumed sweep gives the
+    same results. a result only counts as done when its games and seed
+    match too. returns every result of this sweep, best first """
+    results = readResults(filename)
+    done = set(_runKey(result['key'], result['trainGames'], result['evalGames'], result['seed'])
+               for result in results)
+    wanted = set()
+    tasks = []
+    for i, config in enumerate(configs):
+        run = _runKey(configKey(config), trainGames, evalGames, seed + i)
+        wanted.add(run)
+        if run not in done:
+            done.add(run)
+            tasks.append((trainAndScore, config, trainGames, evalGames, seed + i))
+
+    if tasks:
+        if numWorkers is None:
+            numWorkers = cpu_count()
+        numWorkers = max(1, min(numWorkers, len(tasks)))
+        f = open(filename, 'a')
+        pool = None
+        try:
+            if numWorkers == 1:
+                finished = itertools.imap(callTask, tasks)
+            else:
+                pool = Pool(numWorkers)
+                finished = pool.imap_unordered(callTask, tasks)
+            for result in finished:
+                f.write(json.dumps(result, sort_keys=True) + '\n')
+                f.flush()
+                results.append(result)
+            if pool is not None:
+                pool.close()
+                pool.join()
+                pool = None
+        finally:
+            # a worker's exception must not leave the processes running
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            f.close()
+
+    return rankResults([result for result in results if
+                        _runKey(result['key'], result['trainGames'], result['evalGames'],
+                                result['seed']) in wanted])
+
+def rankResults(results):
+    """ sorts results best score first """
+    return sorted(results, key=lambda result: result['score'], reverse=True)
+
+def formatTable(results):
+    """ returns the ranked results as a text table """
+    names = [name for name, opponentClass in OPPONENTS]
+    lines = ["rank  score  " + "  ".join("%6s" % name for name in names) +
+             "   rate  alpha  disc  hidden  strategy"]
+    for rank, result in enumerate(results):
+        config = result['config']
+        lines.append("%4d  %.3f  " % (rank + 1, result['score']) +
+                     "  ".join("%6.3f" % result['scores'][name] for name in names) +
+                     "  %5.3f  %5.3f  %4.2f  %6d  %s" % (config['learningRate'], config['alpha'],
+                     config['discount'], config['hiddenSize'], config['strategy']))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print "usage: sweep.py results.jsonl [grid|random] [trainGames] [evalGames] [workers] [count]"
+        sys.exit(1)
+    filename = sys.argv[1]
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'random'
+    trainGames = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    evalGames = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else None
+    count = int(sys.argv[6]) if len(sys.argv) > 6 else 20
+
+    if mode == 'grid':
+        configs = gridSearch(SPACE)
+    else:
+        configs = randomSearch(SPACE, count)
+    print formatTable(runSweep(configs, filename, trainGames, evalGames, workers))
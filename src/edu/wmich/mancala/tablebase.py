@@ -0,0 +1,174 @@
+#coding:utf-8
+'''
+Created on May 19, 2010
+
+@author: changwang
+'''
+
+import struct
+import sys
+import time
+
+import numpy
+
+from arrayboard import ArrayMancalaBoard
+
+MAGIC = 'MNCLTB\0\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIII')    # magic, version, row size, max stones
+
+class TablebaseIndex(object):
+    """ maps an endgame position, the stone counts of the 2*rowSize pits
+    plus the player to move, to its slot in the tablebase. positions are
+    grouped by the number of stones in play, then by player to move, and
+    ranked inside a group by the stars and bars numbering of the counts """
+
+    def __init__(self, rowSize, maxStones):
+        self.rowSize = rowSize
+        self.maxStones = maxStones
+        self.numPits = 2 * rowSize
+
+        # binomial[a][b] = a choose b, enough for every rank computation
+        top = maxStones + self.numPits + 1
+        self.binomial = [[0] * (self.numPits + 1) for a in range(top)]
+        for a in range(top):
+            self.binomial[a][0] = 1
+            for b in range(1, min(a, self.numPits) + 1):
+                self.binomial[a][b] = self.binomial[a-1][b-1] + self.binomial[a-1][b]
+
+        # number of ways to spread n stones over every pit
+        self.groupSize = [self.binomial[n + self.numPits - 1][self.numPits - 1]
+                          for n in range(maxStones + 1)]
+        self.base = [0]
+        for n in range(maxStones + 1):
+            self.base.append(self.base[-1] + 2 * self.groupSize[n])
+        self.size = self.base[-1]
+
+    def index(self, pits, player):
+        """ returns the slot of the position, pits holds the counts of the
+        bottom row followed by the top row, without the mancalas """
+        n = sum(pits)
+        rank = 0
+        left = n
+        binomial = self.binomial
+        for i in range(self.numPits - 1):
+            c = pits[i]
+            if c:
+                r = self.numPits - 1 - i
+                rank += binomial[left + r][r] - binomial[left - c + r][r]
+                left -= c
+        return self.base[n] + player * self.groupSize[n] + rank
+
+def _compositions(stones, parts):
+    """ yields every way to put stones into parts pits, as lists """
+    if parts == 1:
+        yield [stones]
+        return
+    for first in range(stones, -1, -1):
+        for rest in _compositions(stones - first, parts - 1):
+            yield [first] + rest
+
+def generate(filename, maxStones, rowSize=6, report=False):
+    """ solves every position with at most maxStones stones in play and
+    writes the values and best moves to filename.
+
+    the value of a position is the number of stones still to be won by the
+    player to move minus those won by the opponent under perfect play. a
+    move that drops nothing into a mancala only carries stones towards the
+    mover's own mancala, so within a stone count every move increases the
+    distance the stones have travelled. solving each stone count from the
+    largest distance down therefore always finds the children solved """
+    if maxStones > 127:
+        raise ValueError("values are stored as int8, maxStones must be at most 127")
+    index = TablebaseIndex(rowSize, maxStones)
+    values = numpy.zeros(index.size, dtype=numpy.int8)
+    moves = numpy.zeros(index.size, dtype=numpy.int8)
+    board = ArrayMancalaBoard(rowSize, 0)
+    n = rowSize
+
+    for stones in range(maxStones + 1):
+        start = time.time()
+        positions = list(_compositions(stones, 2 * n))
+        distance = lambda pits: sum(i * pits[i] + i * pits[n+i] for i in range(n))
+        positions.sort(key=distance, reverse=True)
+
+        for pits in positions:
+            board.setPits(pits[:n] + [0] + pits[n:] + [0])
+            sides = [sum(pits[:n]), sum(pits[n:])]
+            for player in range(2):
+                slot = index.index(pits, player)
+                opp = (player+1)%2
+                if sides[0] == 0 or sides[1] == 0:
+                    values[slot] = sides[player] - sides[opp]
+                    moves[slot] = -1
+                    continue
+
+                best = None
+                bestMove = -1
+                mancala = board.mancala[player]
+                for pitnum in range(n):
+                    if board.pits[player * (n + 1) + pitnum] == 0:
+                        continue
+                    getsTurn, undo = board.makeMove(player, pitnum)
+                    gained = board.pits[mancala]
+                    child = board.pits[:n] + board.pits[n+1:2*n+1]
+                    if getsTurn:
+                        value = gained + int(values[index.index(child, player)])
+                    else:
+                        value = gained - int(values[index.index(child, opp)])
+                    board.unmakeMove(undo)
+                    if best is None or value > best:
+                        best = value
+                        bestMove = pitnum
+                values[slot] = best
+                moves[slot] = bestMove
+        if report:
+            print "%2d stones: %8d positions in %.1fs" % (stones, 2 * len(positions), time.time() - start)
+
+    f = open(filename, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, rowSize, maxStones))
+    f.write(values.tostring())
+    f.write(moves.tostring())
+    f.close()
+
+class Tablebase(object):
+    """ memory-mapped reader of a file written by generate """
+
+    def __init__(self, filename):
+        f = open(filename, 'rb')
+        magic, version, rowSize, maxStones = HEADER.unpack(f.read(HEADER.size))
+        f.close()
+        if magic != MAGIC:
+            raise ValueError("%s is not a tablebase" % filename)
+        if version != VERSION:
+            raise ValueError("unsupported tablebase version %d in %s" % (version, filename))
+
+        self.rowSize = rowSize
+        self.maxStones = maxStones
+        self.index = TablebaseIndex(rowSize, maxStones)
+        self.values = numpy.memmap(filename, dtype=numpy.int8, mode='r',
+                                   offset=HEADER.size, shape=(self.index.size,))
+        self.moves = numpy.memmap(filename, dtype=numpy.int8, mode='r',
+                                  offset=HEADER.size + self.index.size, shape=(self.index.size,))
+
+    def probePits(self, pits, player):
+        """ returns (value, pitnum) for the position with the given counts of
+        the bottom then top row, or None if it has too many stones. pitnum
+        is -1 when the game is already over """
+        if sum(pits) > self.maxStones:
+            return None
+        slot = self.index.index(pits, player)
+        return int(self.values[slot]), int(self.moves[slot])
+
+    def probe(self, board, player):
+        """ looks up the board with player to move, see probePits """
+        if board.rowSize != self.rowSize:
+            return None
+        return self.probePits(board.mySide(0) + board.mySide(1), player)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print "usage: tablebase.py endgame.tb [maxStones]"
+        sys.exit(1)
+    maxStones = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    generate(sys.argv[1], maxStones, report=True)
@@ -0,0 +1,96 @@
+#coding:utf-8
+'''
+Created on Jun 20, 2010
+
+@author: changwang
+'''
+
+import random
+import sys
+import time
+
+import numpy
+
+from arrayboard import ArrayMancalaBoard
+from checkpoint import BackgroundCheckpointer, latestTrainingCheckpoint, readTrainingCheckpoint
+from player import NNPlayer
+import runner
+
+def snapshot(players):
+    """ copies the training state of the players and of both random number
+    generators, returns (arrays, settings) for a checkpoint """
+    arrays = {}
+    states = []
+    for i, player in enumerate(players):
+        playerArrays, settings = player.getTrainingState()
+        for key, value in playerArrays.items():
+            arrays["player%d.%s" % (i, key)] = value
+        states.append(settings)
+    version, keys, position, hasGauss, cachedGaussian = numpy.random.get_state()
+    arrays['numpyRandomKeys'] = keys.copy()
+    settings = {
+        'players': states,
+        'random': random.getstate(),
+        'numpyRandom': [version, position, hasGauss, cachedGaussian],
+    }
+    return arrays, settings
+
+def restore(players, arrays, settings):
+    """ puts a snapshot back into the players and random number generators """
+    for i, player in enumerate(players):
+        prefix = "player%d." % i
+        playerArrays = dict((key[len(prefix):], value) for key, value in arrays.items()
+                            if key.startswith(prefix))
+        player.setTrainingState(playerArrays, settings['players'][i])
+    version, internal, gauss = settings['random']
+    random.setstate((version, tuple(internal), gauss))
+    version, position, hasGauss, cachedGaussian = settings['numpyRandom']
+    numpy.random.set_state((str(version), arrays['numpyRandomKeys'], position, hasGauss, cachedGaussian))
+
+def selfPlay(directory, numGames, every=100, keep=3, seed=0, strategy='weighted', report=False):
+    """ trains two NNPlayers sharing one network by self-play for numGames
+    games in all, checkpointing to directory every `every` games from a
+    background thread. a run started again on the same directory resumes
+    from its newest checkpoint and ends exactly as an uninterrupted run
+    would. returns the players """
+    players = [NNPlayer(0), NNPlayer(1)]
+    players[1].Q = players[0].Q
+    filename = latestTrainingCheckpoint(directory)
+    if filename is not None:
+        start, arrays, settings = readTrainingCheckpoint(filename)
+        restore(players, arrays, settings)
+        players[1].Q = players[0].Q
+        if report:
+            print "resuming from %s after %d games" % (filename, start)
+    else:
+        start = 0
+        random.seed(seed)
+        numpy.random.seed(seed)
+        for player in players:
+            player.setStrategy(strategy)
+
+    checkpointer = BackgroundCheckpointer(directory, keep)
+    began = time.time()
+    try:
+        for game in range(start, numGames):
+            runner.playGame(players[0], players[1], ArrayMancalaBoard())
+            if (game + 1) % every == 0 or game + 1 == numGames:
+                checkpointer.save(game + 1, *snapshot(players))
+                if report:
+                    print "%d games, %.1f games/s" % (game + 1, (game + 1 - start) / (time.time() - began))
+    finally:
+        checkpointer.close()
+    if report:
+        print "%d checkpoints, training blocked %.3fs on the writer, writing took %.3fs" % \
+              (checkpointer.saves, checkpointer.blockedSeconds, checkpointer.writeSeconds)
+    return players
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print "usage: training.py directory games [every] [keep] [seed]"
+        sys.exit(1)
+    directory, games = sys.argv[1], int(sys.argv[2])
+    every = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    keep = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    selfPlay(directory, games, every, keep, seed, report=True)